@@ -0,0 +1,187 @@
+# Bench/bench_async_jobs.py
+"""
+So sánh sức chứa job sinh kế hoạch giữa PLAN_JOB_MODE=thread và PLAN_JOB_MODE=async
+(Gemini giả lập, không tốn quota): đưa N job vào hàng đợi cùng lúc rồi đo số lệnh gọi
+Gemini đang chờ cùng lúc (in-flight), số luồng, bộ nhớ đỉnh và thời gian tới khi job xong.
+
+    python Bench/bench_async_jobs.py                                  # 200 job, độ trễ 1s, cả hai chế độ
+    python Bench/bench_async_jobs.py --jobs 2000 --modes async        # chỉ chế độ async
+    python Bench/bench_async_jobs.py --thread-workers 64 --so-ngay 30 # kế hoạch dài (nhiều lệnh gọi/job)
+    python Bench/bench_async_jobs.py --save async.json
+
+Mỗi chế độ chạy trong một tiến trình con riêng (database mới trong thư mục tạm) vì
+PLAN_JOB_MODE / PLAN_JOB_WORKERS được đọc lúc import app.
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+try:
+    import resource  # không có trên Windows
+except ImportError:
+    resource = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+START_DIR = os.getcwd()
+
+
+# ====== 1️ Tham số ======
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="So sánh sức chứa job sinh kế hoạch: thread vs async")
+    parser.add_argument("--jobs", type=int, default=200, help="Số job đưa vào hàng đợi cùng lúc")
+    parser.add_argument("--latency", type=float, default=1.0, help="Độ trễ mỗi lệnh gọi Gemini giả lập (giây)")
+    parser.add_argument("--so-ngay", type=int, default=7, help="Độ dài kế hoạch (>= PLAN_CHUNK_MIN_DAYS: nhiều lệnh gọi)")
+    parser.add_argument("--modes", default="thread,async", help="Các chế độ cần đo, phân tách bằng dấu phẩy")
+    parser.add_argument("--thread-workers", type=int, default=8, help="PLAN_JOB_WORKERS cho chế độ thread")
+    parser.add_argument("--async-max-inflight", type=int, default=2000, help="PLAN_ASYNC_MAX_INFLIGHT cho chế độ async")
+    parser.add_argument("--timeout", type=float, default=600, help="Giây chờ tối đa mỗi chế độ")
+    parser.add_argument("--save", help="Lưu kết quả dạng JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+# ====== 2️ Tiến trình con: chạy một chế độ ======
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss: KB trên Linux, byte trên macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_child(args):
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": str(args.latency),
+        "FAKE_LLM_DISTRIBUTION": "fixed",
+        "PLAN_JOB_MODE": args.child,
+        "PLAN_JOB_WORKERS": str(args.thread_workers),
+        "PLAN_ASYNC_MAX_INFLIGHT": str(args.async_max_inflight),
+        # Mọi job phải gọi Gemini: tắt cache kế hoạch, bỏ giới hạn tốc độ của bể key
+        "PLAN_CACHE_ENABLED": "0",
+        "PLAN_STREAMING": "0",
+        "GEMINI_KEY_RPM": "1000000",
+        "GEMINI_KEY_BURST": str(args.jobs * 16),
+        "LLM_CALL_TIMEOUT": str(args.timeout),
+    })
+    os.chdir(tempfile.mkdtemp(prefix="bench-async-"))
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    import app  # noqa: E402
+
+    baseline_rss = peak_rss_mb()
+    user_data = {
+        "ho_va_ten": "Bench", "tuoi": "30", "gioi_tinh": "Nam", "chieu_cao_cm": "170", "can_nang_kg": "70",
+        "can_nang_mong_muon": "65", "calo_nap": "2000", "calo_tieu_hao": "2200", "thoi_gian_ngu": "7",
+        "lo_trinh": "Giảm cân", "so_ngay": str(args.so_ngay), "bmi": 24.2, "tinh_trang": "Bình thường",
+    }
+
+    peak = {"inflight": 0, "threads": 0}
+    stop = threading.Event()
+
+    def sample():
+        while not stop.is_set():
+            inflight = sum(k["inflight"] for k in app.key_pool.stats())
+            peak["inflight"] = max(peak["inflight"], inflight)
+            peak["threads"] = max(peak["threads"], threading.active_count())
+            time.sleep(0.02)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.monotonic()
+    enqueued = {app.enqueue_plan_job(dict(user_data), None, {}): time.time() for _ in range(args.jobs)}
+    enqueue_seconds = time.monotonic() - started
+
+    deadline = started + args.timeout
+    while time.monotonic() < deadline:
+        with app.PLAN_JOBS_LOCK:
+            finished = {jid: app.PLAN_JOB_EVENTS[jid] for jid in enqueued if app.PLAN_JOB_EVENTS[jid]["result"] is not None}
+        if len(finished) == len(enqueued):
+            break
+        time.sleep(0.05)
+    elapsed = time.monotonic() - started
+    stop.set()
+    sampler.join()
+
+    latencies = sorted(log["finished_at"] - enqueued[jid] for jid, log in finished.items())
+    errors = sum(1 for log in finished.values() if log["result"]["status"] != "done")
+    return {
+        "mode": args.child,
+        "jobs": args.jobs,
+        "finished": len(finished),
+        "errors": errors,
+        "elapsed": elapsed,
+        "enqueue_seconds": enqueue_seconds,
+        "jobs_per_second": len(finished) / elapsed,
+        "peak_inflight_llm": peak["inflight"],
+        "peak_threads": peak["threads"],
+        "rss_mb": peak_rss_mb(),
+        "rss_growth_mb": None if baseline_rss is None else peak_rss_mb() - baseline_rss,
+        "p50": statistics.median(latencies) if latencies else None,
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None,
+    }
+
+
+# ====== 3️ Tiến trình cha: chạy từng chế độ và so sánh ======
+def run_mode(args, mode):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", mode,
+           "--jobs", str(args.jobs), "--latency", str(args.latency), "--so-ngay", str(args.so_ngay),
+           "--thread-workers", str(args.thread_workers), "--async-max-inflight", str(args.async_max_inflight),
+           "--timeout", str(args.timeout)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, timeout=args.timeout + 120)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    print(f"[ERROR] Chế độ {mode} không trả kết quả:\n{proc.stderr[-2000:]}")
+    return None
+
+
+def print_report(results, args):
+    print(f"\n{args.jobs} job x kế hoạch {args.so_ngay} ngày, mỗi lệnh gọi Gemini {args.latency:.1f}s")
+    fmt = lambda v, spec: "-" if v is None else format(v, spec)  # noqa: E731
+    print(f"{'chế độ':8} {'xong':>6} {'lỗi':>5} {'tổng (s)':>9} {'job/s':>7} {'in-flight':>10} "
+          f"{'luồng':>6} {'RSS (MB)':>9} {'+RSS':>7} {'p50 (s)':>8} {'p95 (s)':>8}")
+    for r in results:
+        print(f"{r['mode']:8} {r['finished']:>6} {r['errors']:>5} {r['elapsed']:>9.1f} {r['jobs_per_second']:>7.1f} "
+              f"{r['peak_inflight_llm']:>10} {r['peak_threads']:>6} {fmt(r['rss_mb'], '.0f'):>9} "
+              f"{fmt(r['rss_growth_mb'], '.0f'):>7} {fmt(r['p50'], '.2f'):>8} {fmt(r['p95'], '.2f'):>8}")
+    print("\nin-flight: số lệnh gọi Gemini đang chờ cùng lúc (đỉnh); luồng: số luồng Python (đỉnh).")
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        # Bỏ log [INFO] của từng lệnh gọi; chỉ dòng RESULT được gửi về tiến trình cha
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = run_child(args)
+        sys.stdout.write("RESULT " + json.dumps(result) + "\n")
+        sys.stdout.flush()
+        os._exit(0)     # không chờ các luồng nền của app
+
+    results = []
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        print(f"[INFO] Đang đo chế độ {mode}...")
+        result = run_mode(args, mode)
+        if result is not None:
+            results.append(result)
+    if not results:
+        return 1
+    print_report(results, args)
+    if args.save:
+        path = os.path.join(START_DIR, args.save)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"[OK] Đã lưu kết quả vào {path}")
+    return 0 if all(r["finished"] == r["jobs"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# Bench/bench_parser.py
+"""
+Benchmark + fuzz cho pipeline xử lý kế hoạch (plan_text -> HTML/to-do).
+
+    python Bench/bench_parser.py                       # đo corpus 7/30/90/365 ngày + fuzz
+    python Bench/bench_parser.py --quick               # ít vòng lặp hơn (CI)
+    python Bench/bench_parser.py --save bench.json     # lưu kết quả làm mốc
+    python Bench/bench_parser.py --baseline bench.json # báo lỗi nếu chậm hơn mốc quá --max-slowdown
+
+Mã thoát khác 0 khi: parser mới lỗi/ngoại lệ, thời gian tăng siêu tuyến tính trên một họ đầu vào
+fuzz (số mũ > --max-exponent), hoặc chậm hơn mốc. Pipeline cũ (legacy) chỉ được báo cáo.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+
+import legacy_parser  # noqa: E402
+import plan_parser  # noqa: E402
+from fake_gemini import MEALS, WORKOUTS  # noqa: E402
+
+
+# ====== 1️ Sinh corpus ======
+def make_plan(so_ngay, seed=0, bold=False, repeat_weeks=False):
+    """Kế hoạch tiếng Việt giống đầu ra Gemini (thêm các biến thể trình bày hay gặp)."""
+    rnd = random.Random(seed)
+    heading = (lambda d: f"**Ngày {d}:**") if bold else (lambda d: f"Ngày {d}:")
+
+    def day_blocks(render_day):
+        lines = []
+        day = 1
+        while day <= so_ngay:
+            if repeat_weeks and day > 7 and (day - 1) % 7 == 0:
+                last = min(day + 6, so_ngay)
+                lines += [f"Ngày {day} đến Ngày {last}:", f"* Lặp lại theo tuần trước, tăng cường độ {rnd.randint(5, 15)}%."]
+                day = last + 1
+                continue
+            lines.append(heading(day))
+            lines += render_day(day)
+            day += 1
+        return lines
+
+    def meals(day):
+        return [f"* {meal}: {rnd.choice(options)} ({rnd.randint(250, 650)} kcal)" for meal, options in MEALS]
+
+    def workout(day):
+        if day % 7 == 0:
+            return ["* Nghỉ ngơi: Đi bộ nhẹ 20 phút và giãn cơ"]
+        name, exercises = rnd.choice(WORKOUTS)
+        return [f"Tập {name}", "* Khởi động: Xoay khớp 5 phút", *[f"* {ex}" for ex in exercises], "* Giãn cơ: 5 phút"]
+
+    return "\n".join([
+        "Kế hoạch AI",
+        f"Kế hoạch Dinh dưỡng và Tập luyện Chi tiết trong {so_ngay} ngày",
+        "", "---", "",
+        "I. Kế hoạch Dinh dưỡng", "",
+        f"1. Mục tiêu calo khoảng {rnd.randint(1600, 2600)} kcal/ngày, **Protein** 30%, **Fat** 25%, **Carb** 45%.",
+        "2. Nguyên tắc dinh dưỡng chung:", "* Ăn đủ 5 bữa, uống 2 lít nước mỗi ngày.",
+        "3. Lịch trình bữa ăn mẫu: sáng 7h, phụ 9h30, trưa 12h, phụ 15h30, tối 18h30.",
+        "4. Thực đơn gợi ý từng ngày",
+        *day_blocks(meals),
+        "5. Gợi ý thay thế nhóm thực phẩm: ức gà có thể thay bằng cá, đậu phụ hoặc trứng.",
+        "", "---", "",
+        "II. Kế hoạch Tập luyện", "",
+        "1. Nguyên tắc tập luyện chung: tập 5 buổi/tuần, khởi động 5-10 phút trước mỗi buổi.",
+        "2. Lịch trình tập luyện",
+        *day_blocks(workout),
+        "", "---", "",
+        "III. Lưu ý chung", "",
+        "- Kiên trì thực hiện và theo dõi cân nặng mỗi tuần.",
+        "- Ngủ đủ 7-8 tiếng để cơ thể phục hồi.",
+        "", "---",
+    ])
+
+
+def malformed_variants(text, seed=0):
+    """Các kiểu đầu ra hỏng hay gặp: bị cắt, thiếu ---, CRLF, dòng trống thừa, thẻ HTML lạc."""
+    rnd = random.Random(seed)
+    lines = text.split("\n")
+    yield "cắt cụt", text[: len(text) * 2 // 3]
+    yield "thiếu ---", text.replace("\n---\n", "\n")
+    yield "CRLF", text.replace("\n", "\r\n")
+    yield "dòng trống thừa", text.replace("\n", "\n\n\n")
+    yield "xáo dòng", "\n".join(rnd.sample(lines, len(lines)))
+    yield "thẻ lạc", text.replace("* Trưa:", "* <Trưa: ", 5)
+    yield "ngày trùng", text.replace("Ngày 3:", "Ngày 2:")
+
+
+def build_corpus(sizes, quick=False):
+    corpus = []
+    for n in sizes:
+        corpus.append((f"{n} ngày", make_plan(n, seed=n)))
+        corpus.append((f"{n} ngày (in đậm)", make_plan(n, seed=n, bold=True)))
+        if n > 7:
+            # Pipeline cũ chỉ nhận số ngày 1-2 chữ số: với 365 ngày nó bỏ qua phần lớn kế hoạch
+            corpus.append((f"{n} ngày (khối lặp)", make_plan(n, seed=n, repeat_weeks=True)))
+        if not quick or n == sizes[0]:
+            corpus += [(f"{n} ngày [{name}]", t) for name, t in malformed_variants(corpus[-1][1], seed=n)]
+    return corpus
+
+
+# ====== 2️ Các giai đoạn cần đo ======
+def legacy_markdown(text):
+    return legacy_parser.markdown_like_to_html(text)
+
+
+def legacy_sections(text):
+    return legacy_parser.parse_full_plan_sections(text)
+
+
+def legacy_todos(text, _cache={}):
+    # Chỉ đo phần tách to-do: kết quả tách phần được tính trước (không tính giờ)
+    if text not in _cache:
+        _cache.clear()
+        _cache[text] = legacy_parser.parse_full_plan_sections(text)[3]
+    return [legacy_parser.parse_day_details_to_todos(d["nutrition_html"], d["workout_html"]) for d in _cache[text]]
+
+
+STAGES = [
+    ("legacy", "markdown_like_to_html", legacy_markdown),
+    ("legacy", "parse_full_plan_sections", legacy_sections),
+    ("legacy", "parse_day_details_to_todos", legacy_todos),
+    ("legacy", "tổng (build)", legacy_parser.legacy_build_parsed_plan),
+    ("new", "parse_plan (AST)", plan_parser.parse_plan),
+    ("new", "tổng (build)", plan_parser.build_plan),
+]
+
+
+def time_call(fn, arg, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def peak_memory(fn, arg):
+    tracemalloc.start()
+    try:
+        fn(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(corpus, repeat):
+    results = []
+    print(f"{'corpus':<28}{'KB':>7}  {'pipeline':<7}{'giai đoạn':<28}{'ms':>9}{'MB/s':>8}{'peak KB':>9}")
+    for name, text in corpus:
+        size = len(text.encode("utf-8"))
+        for pipeline, stage, fn in STAGES:
+            seconds = time_call(fn, text, repeat)
+            peak = peak_memory(fn, text) if stage.startswith("tổng") else None
+            results.append({"corpus": name, "bytes": size, "pipeline": pipeline, "stage": stage,
+                            "seconds": seconds, "peak_bytes": peak})
+            print(f"{name:<28}{size / 1024:>7.1f}  {pipeline:<7}{stage:<28}{seconds * 1000:>9.2f}"
+                  f"{size / seconds / 1e6 if seconds else 0:>8.1f}"
+                  f"{'' if peak is None else f'{peak / 1024:.0f}':>9}")
+    return results
+
+
+# ====== 3️ Fuzz: phát hiện thời gian chạy siêu tuyến tính ======
+def _with_daily(body):
+    # Khung tối thiểu: phần cố định nhỏ để độ dốc phản ánh đúng phần tăng theo n
+    return "\n".join(["Kế hoạch AI", "---", "II. Kế hoạch Tập luyện", "2. Lịch trình tập luyện", body, "---"])
+
+
+FUZZ_FAMILIES = {
+    # mỗi họ: n -> đầu vào có kích thước ~ tỉ lệ với n
+    "khoảng trắng trong bài tập": lambda n: _with_daily("Ngày 1:\nSquat" + " " * n + "x"),
+    "'Ngày 1 ' lặp không có dấu :": lambda n: _with_daily("Ngày 1 " * n),
+    "chuỗi 'Ngày X đến'": lambda n: _with_daily(" ".join(f"Ngày {i} đến" for i in range(n // 10))),
+    "** không đóng": lambda n: _with_daily("Ngày 1:\n* " + "**a " * (n // 4)),
+    "dòng rất dài": lambda n: _with_daily("Ngày 1:\n* Sáng: " + "yến mạch " * (n // 9)),
+    "--- liên tiếp": lambda n: _with_daily("\n---" * (n // 4)),
+    "dòng trống": lambda n: _with_daily("Ngày 1:\n" + "\n" * n + "Squat: a"),
+    "'<' không đóng": lambda n: _with_daily("Ngày 1:\n* Sáng: " + "< a " * (n // 4)),
+    "tiêu đề phần lặp": lambda n: "\n".join(["x"] + ["---", "I. Kế hoạch Dinh dưỡng", "Ngày 1:"] * (n // 30)),
+    # số ngày do LLM viết ra không được quyết định số ngày dựng (và bộ nhớ)
+    "khoảng ngày khổng lồ": lambda n: _with_daily(f"Ngày 1:\nSquat: a\nNgày 2 đến Ngày {n * 1000}:\n* Lặp lại"),
+    "số ngày rất dài": lambda n: _with_daily("Ngày 1:\nSquat: a\nNgày 2 đến Ngày " + "9" * n + ":\n* Lặp lại"),
+}
+
+# Gọi thẳng day_todos (không qua build_plan, vốn đã bỏ khoảng trắng đầu/cuối mỗi dòng)
+DAY_TODOS_FAMILIES = {
+    "dòng chỉ có khoảng trắng (to-do)": lambda n: ("Sáng: a\n" + " \n" * (n // 2), ""),
+    "'Sáng' không có dấu : (to-do)": lambda n: ("Sáng\n \n" * (n // 7), ""),
+}
+
+
+def scaling_exponent(fn, family, sizes, repeat):
+    """Độ dốc log(thời gian) theo log(n): ~1 là tuyến tính, ~2 là bậc hai."""
+    points = [(math.log(n), math.log(max(time_call(fn, family(n), repeat), 1e-7))) for n in sizes]
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    return (sum((x - mean_x) * (y - mean_y) for x, y in points)
+            / sum((x - mean_x) ** 2 for x, _ in points))
+
+
+def random_mutations(count, seed=0):
+    """Văn bản ghép ngẫu nhiên từ các mảnh cú pháp của plan_text (kiểm tra không ném ngoại lệ)."""
+    rnd = random.Random(seed)
+    pieces = ["Ngày ", "1", "12", "123", ":", " đến ", "**", "* ", "- ", "4. Thực đơn gợi ý từng ngày",
+              "2. Lịch trình tập luyện", "I. Kế hoạch Dinh dưỡng", "II. Kế hoạch Tập luyện",
+              "III. Lưu ý chung", "---", "\n", "\n\n", "\r\n", "Sáng", "Tập ", "<", ">", " ", "(", ")", "."]
+    for _ in range(count):
+        yield "".join(rnd.choice(pieces) for _ in range(rnd.randint(1, 400)))
+
+
+def run_fuzz(sizes, repeat, max_exponent, mutations):
+    failures = []
+    print(f"\n{'họ đầu vào':<34}{'legacy':>10}{'new':>10}")
+    for name, family in FUZZ_FAMILIES.items():
+        exps = {}
+        for pipeline, fn in (("legacy", legacy_parser.legacy_build_parsed_plan), ("new", plan_parser.build_plan)):
+            exps[pipeline] = scaling_exponent(fn, family, sizes, repeat)
+        flag = "  <-- siêu tuyến tính" if exps["new"] > max_exponent else (
+            "  (legacy siêu tuyến tính)" if exps["legacy"] > max_exponent else "")
+        print(f"{name:<34}{exps['legacy']:>10.2f}{exps['new']:>10.2f}{flag}")
+        if exps["new"] > max_exponent:
+            failures.append(f"fuzz '{name}': số mũ {exps['new']:.2f} > {max_exponent}")
+
+    for name, family in DAY_TODOS_FAMILIES.items():
+        exp = scaling_exponent(lambda args: plan_parser.day_todos(*args), family, sizes, repeat)
+        print(f"{name:<34}{'-':>10}{exp:>10.2f}{'  <-- siêu tuyến tính' if exp > max_exponent else ''}")
+        if exp > max_exponent:
+            failures.append(f"fuzz '{name}': số mũ {exp:.2f} > {max_exponent}")
+
+    for name in ("khoảng ngày khổng lồ", "số ngày rất dài"):
+        days = len(plan_parser.build_plan(FUZZ_FAMILIES[name](max(sizes)))["days"])
+        if days > plan_parser.MAX_PLAN_DAYS:
+            failures.append(f"fuzz '{name}': dựng {days} ngày > MAX_PLAN_DAYS ({plan_parser.MAX_PLAN_DAYS})")
+
+    crashed = 0
+    for text in random_mutations(mutations):
+        try:
+            plan_parser.build_plan(text)
+        except Exception as e:  # noqa: BLE001 - fuzz: mọi ngoại lệ đều là lỗi
+            crashed += 1
+            if crashed <= 3:
+                failures.append(f"parser mới ném {type(e).__name__}: {e!r} với đầu vào {text[:80]!r}")
+    print(f"\nĐột biến ngẫu nhiên: {mutations} đầu vào, {crashed} lỗi")
+    return failures
+
+
+# ====== 4️ So với mốc ======
+def compare_baseline(results, baseline_path, max_slowdown):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["corpus"], r["pipeline"], r["stage"]): r["seconds"] for r in json.load(f)["results"]}
+    failures = []
+    for r in results:
+        before = baseline.get((r["corpus"], r["pipeline"], r["stage"]))
+        if r["pipeline"] == "new" and before and r["seconds"] > before * (1 + max_slowdown):
+            failures.append(f"{r['corpus']} / {r['stage']}: {before * 1000:.2f}ms -> {r['seconds'] * 1000:.2f}ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="ít vòng lặp và ít biến thể hơn")
+    parser.add_argument("--sizes", default="7,30,90,365", help="số ngày của corpus")
+    parser.add_argument("--max-exponent", type=float, default=1.3, help="ngưỡng số mũ cho fuzz")
+    parser.add_argument("--save", help="lưu kết quả (JSON) để làm mốc")
+    parser.add_argument("--baseline", help="file JSON mốc để so sánh")
+    parser.add_argument("--max-slowdown", type=float, default=0.25, help="cho phép chậm hơn mốc tối đa (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    repeat = 3 if args.quick else 7
+    sizes = [int(s) for s in args.sizes.split(",")]
+    results = run_benchmark(build_corpus(sizes, args.quick), repeat)
+
+    fuzz_sizes = [1000, 2000, 4000, 8000] if args.quick else [2000, 4000, 8000, 16000]
+    failures = run_fuzz(fuzz_sizes, 1 if args.quick else 3, args.max_exponent, 200 if args.quick else 2000)
+
+    if args.baseline:
+        failures += compare_baseline(results, args.baseline, args.max_slowdown)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "results": results}, f, ensure_ascii=False, indent=1)
+
+    if failures:
+        print("\nKHÔNG ĐẠT:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nĐẠT")
+
+
+if __name__ == "__main__":
+    main()
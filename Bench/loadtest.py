@@ -0,0 +1,358 @@
+# Bench/loadtest.py
+"""
+Kiểm thử tải end-to-end, không tốn quota Gemini: N người dùng ảo chạy song song luồng
+register -> /bmi-form -> /analyzing -> /result -> /confirm_plan -> /current_plan
+(+ đánh dấu to-do, /progress_summary), báo throughput và p50/p90/p95/p99 theo từng route.
+
+    python Bench/loadtest.py --users 20 --duration 60                 # app chạy trong tiến trình, Gemini giả lập
+    python Bench/loadtest.py --users 50 --llm-distribution lognormal --llm-latency 8
+    python Bench/loadtest.py --users 20 --error-rate 0.05 --rate-limit-rate 0.1
+    python Bench/loadtest.py --url http://127.0.0.1:8000 --users 50   # server ngoài (vd. gunicorn + LLM_BACKEND=fake)
+    python Bench/loadtest.py --users 20 --iterations 3 --save run.json
+
+Không có --url: script đặt LLM_BACKEND=fake (+ FAKE_LLM_* theo tham số), tạo database mới trong
+thư mục tạm rồi phục vụ app bằng werkzeug threaded. Server và người dùng ảo chung một GIL nên
+số liệu chỉ dùng để so sánh tương đối; trước khi đổi số worker / cấu hình DB hãy chạy server
+thật (gunicorn, cùng FAKE_LLM_*) và trỏ --url vào đó.
+
+Cuối lượt chạy script đọc /metrics (chỉ mở cho địa chỉ nội bộ) để in thêm số liệu cache và LLM.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+from collections import defaultdict
+from datetime import date, timedelta
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+START_DIR = os.getcwd()
+
+JOB_RE = re.compile(r"/analyzing/status/([0-9a-f]+)")
+RESULT_RE = re.compile(r"/result/(\d+)")
+TODO_RE = re.compile(r'data-plan-id="(\d+)"\s+data-day="(\d+)"\s+data-index="(\d+)"\s+data-total="(\d+)"')
+# Số liệu lấy từ /metrics để in kèm báo cáo
+METRIC_PREFIXES = ("cache_events_total", "llm_failovers_total", "llm_hedged_requests_total",
+                   "llm_deadline_exceeded_total", "db_lock_waits_total")
+
+
+# ====== 1️ Tham số ======
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kiểm thử tải luồng tạo kế hoạch với Gemini giả lập")
+    parser.add_argument("--url", help="Server có sẵn (mặc định: chạy app trong tiến trình này)")
+    parser.add_argument("--users", type=int, default=10, help="Số người dùng ảo chạy song song")
+    parser.add_argument("--duration", type=float, default=60, help="Số giây chạy (bỏ qua nếu có --iterations)")
+    parser.add_argument("--iterations", type=int, help="Số lượt chạy trọn luồng của mỗi người dùng ảo")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Giây để khởi động đủ người dùng ảo")
+    parser.add_argument("--so-ngay", default="7,14,30", help="Các độ dài kế hoạch (ngày), chọn ngẫu nhiên")
+    parser.add_argument("--toggles", type=int, default=5, help="Số to-do đánh dấu mỗi lượt")
+    parser.add_argument("--job-timeout", type=float, default=300, help="Giây chờ tối đa một job sinh kế hoạch")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Chu kỳ hỏi /analyzing/status (giây)")
+    # Gemini giả lập (chỉ áp dụng khi chạy trong tiến trình; với --url hãy đặt FAKE_LLM_* cho server)
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="Độ trễ (trung vị) mỗi lệnh gọi Gemini")
+    parser.add_argument("--llm-jitter", type=float, default=0.5)
+    parser.add_argument("--llm-distribution", choices=["uniform", "fixed", "lognormal"], default="uniform")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="Độ lệch của phân phối lognormal")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ lệnh gọi lỗi 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Tỉ lệ lệnh gọi lỗi 429")
+    parser.add_argument("--key-rpm", type=float, default=6000,
+                        help="GEMINI_KEY_RPM cho server trong tiến trình (mặc định đủ lớn để không bị giới hạn)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Lưu kết quả dạng JSON")
+    return parser.parse_args()
+
+
+# ====== 2️ Server trong tiến trình ======
+def start_local_server(args):
+    """Import app với Gemini giả lập + database mới trong thư mục tạm, trả về URL gốc."""
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["FAKE_LLM_JITTER"] = str(args.llm_jitter)
+    os.environ["FAKE_LLM_DISTRIBUTION"] = args.llm_distribution
+    os.environ["FAKE_LLM_SIGMA"] = str(args.llm_sigma)
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.error_rate)
+    os.environ["FAKE_LLM_RATE_LIMIT_RATE"] = str(args.rate_limit_rate)
+    os.environ.setdefault("GEMINI_KEY_RPM", str(args.key_rpm))
+    os.environ.setdefault("GEMINI_KEY_BURST", str(max(2, args.users)))
+    os.chdir(tempfile.mkdtemp(prefix="loadtest-"))
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+
+    import app  # noqa: E402
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)   # bỏ log từng request
+
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="loadtest-server", daemon=True).start()
+    print(f"[INFO] App chạy trong tiến trình tại http://127.0.0.1:{server.server_port} "
+          f"(database: {os.path.join(os.getcwd(), app.DATABASE)})")
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+# ====== 3️ Người dùng ảo ======
+class Stats:
+    def __init__(self):
+        self.samples = defaultdict(list)    # route -> [giây]
+        self.errors = defaultdict(int)      # route -> số lỗi
+        self.flows = 0
+        self.failed_flows = 0
+        self.degraded_flows = 0             # kế hoạch không có to-do (Gemini lỗi -> nội dung dự phòng)
+        self.job_seconds = []               # /analyzing -> job xong (chờ Gemini)
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            self.samples[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+    def finish_flow(self, ok, job_seconds=None, degraded=False):
+        with self._lock:
+            if ok:
+                self.flows += 1
+            else:
+                self.failed_flows += 1
+            if degraded:
+                self.degraded_flows += 1
+            if job_seconds is not None:
+                self.job_seconds.append(job_seconds)
+
+
+class FlowError(Exception):
+    pass
+
+
+class VirtualUser:
+    def __init__(self, base_url, stats, args, index):
+        self.base_url = base_url.rstrip("/")
+        self.stats = stats
+        self.args = args
+        self.rnd = random.Random(args.seed * 100003 + index)
+        self.session = requests.Session()
+        self.email = f"load-{index}-{uuid.uuid4().hex[:8]}@loadtest.local"
+        self.password = "loadtest"
+
+    def call(self, route, method, path, expect=(200,), **kwargs):
+        """Gửi request, ghi thời gian theo nhãn route (đường dẫn đã bỏ id)."""
+        start = time.perf_counter()
+        try:
+            r = self.session.request(method, self.base_url + path, timeout=60, **kwargs)
+        except requests.RequestException as e:
+            self.stats.record(route, time.perf_counter() - start, False)
+            raise FlowError(f"{method} {path}: {e}") from e
+        ok = r.status_code in expect
+        self.stats.record(route, time.perf_counter() - start, ok)
+        if not ok:
+            raise FlowError(f"{method} {path}: HTTP {r.status_code}")
+        return r
+
+    def sign_up(self):
+        self.call("POST /register", "POST", "/register", expect=(200, 302), allow_redirects=False,
+                  data={"ho_va_ten": "Người dùng tải", "email": self.email, "password": self.password})
+        r = self.call("POST /login", "POST", "/login", expect=(200, 302), allow_redirects=False,
+                      data={"email": self.email, "password": self.password})
+        if r.status_code != 302:
+            raise FlowError("đăng nhập thất bại")
+
+    def profile_form(self):
+        chieu_cao = self.rnd.randint(150, 190)
+        can_nang = round(self.rnd.uniform(45, 110), 1)
+        return {
+            "ho_va_ten": "Người dùng tải",
+            "tuoi": str(self.rnd.randint(18, 60)),
+            "gioi_tinh": self.rnd.choice(["Nam", "Nữ"]),
+            "chieu_cao_cm": str(chieu_cao),
+            "can_nang_kg": str(can_nang),
+            "can_nang_mong_muon": str(round(can_nang + self.rnd.uniform(-10, 5), 1)),
+            "calo_nap": str(self.rnd.randint(1500, 3000)),
+            "calo_tieu_hao": str(self.rnd.randint(1500, 3000)),
+            "thoi_gian_ngu": str(self.rnd.randint(5, 9)),
+            "so_ngay": self.rnd.choice(self.args.so_ngay.split(",")).strip(),
+            "lo_trinh": self.rnd.choice(["Giảm cân", "Tăng cân", "Giữ cân"]),
+        }
+
+    def wait_for_job(self, job_id):
+        deadline = time.monotonic() + self.args.job_timeout
+        while time.monotonic() < deadline:
+            status = self.call("GET /analyzing/status/<job>", "GET", f"/analyzing/status/{job_id}").json()
+            if status["status"] == "done":
+                return status["result_url"]
+            if status["status"] == "error":
+                raise FlowError(f"job lỗi: {status.get('error')}")
+            time.sleep(self.args.poll_interval)
+        raise FlowError("job quá hạn chờ")
+
+    def run_flow(self):
+        self.call("GET /bmi-form", "GET", "/bmi-form")
+        started = time.perf_counter()
+        r = self.call("POST /analyzing", "POST", "/analyzing", data=self.profile_form(), allow_redirects=False)
+        m = JOB_RE.search(r.text)
+        if not m:
+            raise FlowError("không thấy job_id trong trang /analyzing")
+        result_url = self.wait_for_job(m.group(1))
+        job_seconds = time.perf_counter() - started
+        rid = RESULT_RE.search(result_url).group(1)
+        self.call("GET /result/<rid>", "GET", f"/result/{rid}")
+
+        today = date.today()
+        self.call("POST /confirm_plan", "POST", "/confirm_plan", expect=(200, 302), allow_redirects=False, data={
+            "plan_name": f"Kế hoạch tải {rid}",
+            "start_date": today.isoformat(),
+            "end_date": (today + timedelta(days=90)).isoformat(),
+            "ai_result_id": rid,
+        })
+        page = self.call("GET /current_plan", "GET", "/current_plan").text
+        todos = TODO_RE.findall(page)
+        if todos:
+            picked = self.rnd.sample(todos, min(self.args.toggles, len(todos)))
+            self.call("POST /update_todo_progress/batch", "POST", "/update_todo_progress/batch", json={
+                "plan_id": int(picked[0][0]),
+                "changes": [{"day_number": int(day), "todo_index": int(index), "completed": True,
+                             "total_todos": int(total)} for _, day, index, total in picked],
+            })
+        # Lần hai: trang đã đổi phiên bản tiến độ -> render lại; lần ba: trúng cache
+        self.call("GET /current_plan", "GET", "/current_plan")
+        self.call("GET /current_plan", "GET", "/current_plan")
+        self.call("GET /progress_summary", "GET", "/progress_summary")
+        return job_seconds, not todos
+
+    def run(self, stop_at, iterations):
+        try:
+            self.sign_up()
+        except FlowError as e:
+            print(f"[ERROR] {self.email}: {e}")
+            self.stats.finish_flow(False)
+            return
+        done = 0
+        while (iterations is None and time.monotonic() < stop_at) or (iterations is not None and done < iterations):
+            try:
+                job_seconds, degraded = self.run_flow()
+                self.stats.finish_flow(True, job_seconds, degraded)
+            except FlowError as e:
+                print(f"[ERROR] {self.email}: {e}")
+                self.stats.finish_flow(False)
+            done += 1
+
+
+# ====== 4️ Báo cáo ======
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(stats, elapsed):
+    routes = {}
+    for route, values in sorted(stats.samples.items()):
+        values = sorted(values)
+        routes[route] = {
+            "count": len(values),
+            "errors": stats.errors.get(route, 0),
+            "rps": len(values) / elapsed,
+            "mean": statistics.fmean(values),
+            **{f"p{q}": percentile(values, q) for q in (50, 90, 95, 99)},
+            "max": values[-1],
+        }
+    job = sorted(stats.job_seconds)
+    return {
+        "elapsed": elapsed,
+        "flows": stats.flows,
+        "failed_flows": stats.failed_flows,
+        "degraded_flows": stats.degraded_flows,
+        "flows_per_second": stats.flows / elapsed,
+        "job_seconds": {f"p{q}": percentile(job, q) for q in (50, 95, 99)} if job else None,
+        "routes": routes,
+    }
+
+
+def scrape_metrics(base_url):
+    try:
+        r = requests.get(base_url.rstrip("/") + "/metrics", timeout=10)
+    except requests.RequestException:
+        return None
+    if r.status_code != 200:
+        return None
+    return [line for line in r.text.splitlines() if line.startswith(METRIC_PREFIXES)]
+
+
+def print_report(summary, metric_lines):
+    ms = lambda v: "-" if v is None else f"{v * 1000:.0f}"  # noqa: E731
+    print()
+    print(f"{'route':34} {'n':>6} {'lỗi':>5} {'req/s':>7} {'p50':>7} {'p90':>7} {'p95':>7} {'p99':>7} {'max':>7}  (ms)")
+    for route, s in summary["routes"].items():
+        print(f"{route:34} {s['count']:>6} {s['errors']:>5} {s['rps']:>7.2f} {ms(s['p50']):>7} {ms(s['p90']):>7} "
+              f"{ms(s['p95']):>7} {ms(s['p99']):>7} {ms(s['max']):>7}")
+    print()
+    print(f"Luồng hoàn tất: {summary['flows']} (lỗi {summary['failed_flows']}) trong {summary['elapsed']:.1f}s "
+          f"-> {summary['flows_per_second'] * 60:.1f} luồng/phút")
+    if summary["degraded_flows"]:
+        print(f"[WARN] {summary['degraded_flows']} luồng nhận kế hoạch dự phòng (không có to-do) do lỗi Gemini")
+    if summary["job_seconds"]:
+        job = summary["job_seconds"]
+        print(f"Chờ sinh kế hoạch (/analyzing -> xong): p50 {job['p50']:.2f}s, p95 {job['p95']:.2f}s, p99 {job['p99']:.2f}s")
+    if metric_lines:
+        print()
+        print("Số liệu server (/metrics):")
+        for line in metric_lines:
+            print(f"  {line}")
+
+
+# ====== 5️ Chạy ======
+def main():
+    args = parse_args()
+    if args.users < 1:
+        sys.exit("[ERROR] --users phải >= 1")
+    server = None
+    if args.url:
+        base_url = args.url
+    else:
+        base_url, server = start_local_server(args)
+
+    stats = Stats()
+    users = [VirtualUser(base_url, stats, args, i) for i in range(args.users)]
+    mode = f"{args.iterations} lượt/người" if args.iterations else f"{args.duration:.0f}s"
+    print(f"[INFO] {args.users} người dùng ảo, {mode}, ramp-up {args.ramp_up:.0f}s -> {base_url}")
+
+    started = time.monotonic()
+    stop_at = started + args.duration
+    threads = []
+    for i, user in enumerate(users):
+        t = threading.Thread(target=user.run, args=(stop_at, args.iterations), name=f"vu-{i}", daemon=True)
+        threads.append(t)
+        t.start()
+        if args.ramp_up and i < len(users) - 1:
+            time.sleep(args.ramp_up / len(users))
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    summary = summarize(stats, elapsed)
+    summary["config"] = vars(args)
+    metric_lines = scrape_metrics(base_url)
+    summary["metrics"] = metric_lines
+    print_report(summary, metric_lines)
+
+    if args.save:
+        path = os.path.join(START_DIR, args.save)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"[OK] Đã lưu kết quả vào {path}")
+    if server is not None:
+        server.shutdown()
+    return 1 if summary["failed_flows"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 import pickle
@@ -7,6 +9,9 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, ConfusionMatrixDisplay
 from imblearn.over_sampling import SMOTE
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from forest_engine import export_forest
+
 # ====== 1️ Đọc dữ liệu ======
 df = pd.read_csv(r"D:\chuyendoiso\Data\data.csv")
 
@@ -93,4 +98,9 @@ plt.show()
 model_path = r"D:\chuyendoiso\model_classes.pkl"
 with open(model_path, 'wb') as f:
     pickle.dump(clf, f)
-print(f"\n Mô hình 5 lớp đã được lưu tại: {model_path}")
\ No newline at end of file
+print(f"\n Mô hình 5 lớp đã được lưu tại: {model_path}")
+
+# ====== 11 Xuất model dạng mảng NumPy cho web (không cần sklearn khi chạy) ======
+npz_path = os.path.splitext(model_path)[0] + ".npz"
+export_forest(clf, npz_path)
+print(f" Đã xuất {len(clf.estimators_)} cây dạng mảng (mmap được) tại: {npz_path}")
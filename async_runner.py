@@ -0,0 +1,67 @@
+# async_runner.py
+"""
+Event loop asyncio chạy trên một luồng nền, dành cho job chủ yếu chờ I/O mạng (gọi Gemini).
+
+Mỗi job đang chờ phản hồi chỉ là một coroutine (vài KB) thay vì một luồng giữ stack riêng,
+nên một tiến trình giữ được hàng nghìn job cùng lúc. Việc chặn (SQLite, phân tích kế hoạch)
+phải đi qua run_blocking() để chạy trên bể luồng riêng, không làm đứng event loop.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncLoopThread:
+    def __init__(self, name="async-jobs", max_inflight=1000, blocking_workers=4):
+        self.name = name
+        self.max_inflight = max_inflight
+        self.blocking_executor = ThreadPoolExecutor(max_workers=blocking_workers, thread_name_prefix=f"{name}-io")
+        self.running = 0            # job đang chạy (đã vào semaphore)
+        self.waiting = 0            # job đang chờ vì đã đủ max_inflight
+        self._loop = None
+        self._thread = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        # Tạo loop khi có job đầu tiên (và tạo lại sau fork: luồng không sống qua fork)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+                self._slots = None
+            return self._loop
+
+    async def _limited(self, coro):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_inflight)
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await coro
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    def submit(self, coro_fn, *args):
+        """Chạy coro_fn(*args) trên event loop (tối đa max_inflight job cùng lúc), trả về concurrent Future."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._limited(coro_fn(*args)), loop)
+
+    async def run_blocking(self, fn, *args):
+        """Chạy hàm chặn fn(*args) trên bể luồng riêng và chờ kết quả mà không chặn event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self.blocking_executor, fn, *args)
@@ -0,0 +1,275 @@
+# fake_gemini.py
+"""
+Backend giả lập Gemini dùng để chạy/kiểm thử tải offline (LLM_BACKEND=fake).
+Trả về kế hoạch tiếng Việt đúng định dạng mà plan_parser (và legacy_parser) mong đợi.
+"""
+import asyncio
+import math
+import os
+import random
+import re
+import time
+
+# Độ trễ giả lập (giây) cho mỗi lệnh gọi generate_content
+FAKE_LLM_LATENCY = float(os.environ.get("FAKE_LLM_LATENCY", "2.0"))
+FAKE_LLM_JITTER = float(os.environ.get("FAKE_LLM_JITTER", "0.5"))
+# Phân phối độ trễ: "uniform" (LATENCY ± JITTER), "fixed", hoặc "lognormal" (trung vị LATENCY,
+# độ lệch FAKE_LLM_SIGMA - có đuôi dài giống API thật)
+FAKE_LLM_DISTRIBUTION = os.environ.get("FAKE_LLM_DISTRIBUTION", "uniform")
+FAKE_LLM_SIGMA = float(os.environ.get("FAKE_LLM_SIGMA", "0.5"))
+# Tỉ lệ lệnh gọi lỗi giả lập: lỗi server (500) và hết quota (429)
+FAKE_LLM_ERROR_RATE = float(os.environ.get("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_RATE_LIMIT_RATE = float(os.environ.get("FAKE_LLM_RATE_LIMIT_RATE", "0"))
+
+MEALS = [
+    ("Sáng", ["Yến mạch 60g + sữa tươi không đường 200ml + 1 quả chuối",
+              "Bánh mì đen 2 lát + 2 quả trứng luộc + dưa chuột",
+              "Phở gà 1 bát nhỏ (ít bánh, nhiều rau)"]),
+    ("Phụ sáng", ["Sữa chua Hy Lạp 100g", "1 quả táo", "Hạt hạnh nhân 20g"]),
+    ("Trưa", ["Cơm gạo lứt 150g + ức gà áp chảo 120g + rau luộc",
+              "Bún cá 1 bát + rau sống",
+              "Cơm trắng 120g + cá hồi 100g + canh rau ngót"]),
+    ("Phụ chiều", ["Khoai lang luộc 100g", "1 ly sinh tố bơ không đường", "1 quả cam"]),
+    ("Tối", ["Đậu phụ sốt cà chua 150g + rau xào + cơm 100g",
+             "Thịt bò xào súp lơ 120g + canh bí",
+             "Salad ức gà 150g + 1 lát bánh mì đen"]),
+]
+
+WORKOUTS = [
+    ("Toàn thân", ["Squat: 3 hiệp x 12 lần", "Hít đất: 3 hiệp x 10 lần", "Plank: 3 hiệp x 30 giây"]),
+    ("Cardio", ["Chạy bộ nhẹ: 30 phút", "Nhảy dây: 3 hiệp x 1 phút", "Burpee: 3 hiệp x 8 lần"]),
+    ("Lưng - Tay", ["Chèo tạ đơn: 3 hiệp x 12 lần", "Cuốn tạ tay: 3 hiệp x 12 lần", "Dip ghế: 3 hiệp x 10 lần"]),
+    ("Chân - Mông", ["Lunge: 3 hiệp x 10 lần mỗi chân", "Glute bridge: 3 hiệp x 15 lần", "Bắp chân: 3 hiệp x 20 lần"]),
+]
+
+
+def _fake_meal_days(rnd, first, last):
+    lines = []
+    for day in range(first, last + 1):
+        lines.append(f"Ngày {day}:")
+        for meal, options in MEALS:
+            lines.append(f"* {meal}: {rnd.choice(options)}")
+    return lines
+
+
+def _fake_workout_days(rnd, first, last):
+    lines = []
+    for day in range(first, last + 1):
+        lines.append(f"Ngày {day}:")
+        if day % 7 == 0:
+            lines.append("* Nghỉ ngơi: Đi bộ nhẹ 20 phút và giãn cơ")
+            continue
+        name, exercises = rnd.choice(WORKOUTS)
+        lines.append(f"Tập {name}")
+        lines.append("* Khởi động: Xoay khớp 5 phút")
+        for ex in exercises:
+            lines.append(f"* {ex}")
+        lines.append("* Giãn cơ: 5 phút")
+    return lines
+
+
+NUTRITION_GENERAL = [
+    "1. Mục tiêu calo khoảng 1900 kcal/ngày, **Protein** 30%, **Fat** 25%, **Carb** 45%.",
+    "2. Nguyên tắc dinh dưỡng chung:",
+    "* Ăn đủ 5 bữa, uống 2 lít nước mỗi ngày.",
+    "* Hạn chế đồ chiên rán và nước ngọt.",
+    "3. Lịch trình bữa ăn mẫu: sáng 7h, phụ 9h30, trưa 12h, phụ 15h30, tối 18h30.",
+]
+NUTRITION_SUBSTITUTES = ["5. Gợi ý thay thế nhóm thực phẩm: ức gà có thể thay bằng cá, đậu phụ hoặc trứng."]
+WORKOUT_GENERAL = ["1. Nguyên tắc tập luyện chung: tập 5 buổi/tuần, khởi động 5-10 phút trước mỗi buổi."]
+NOTES = [
+    "- Kiên trì thực hiện và theo dõi cân nặng mỗi tuần.",
+    "- Ngủ đủ 7-8 tiếng để cơ thể phục hồi.",
+    "- Điều chỉnh linh hoạt kế hoạch nếu thấy mệt mỏi.",
+]
+
+
+def build_fake_plan(so_ngay, seed=None):
+    """Sinh một kế hoạch mẫu {so_ngay} ngày theo đúng cấu trúc prompt."""
+    rnd = random.Random(seed)
+    lines = [
+        "Kế hoạch AI",
+        f"Kế hoạch Dinh dưỡng và Tập luyện Chi tiết trong {so_ngay} ngày",
+        "",
+        "---",
+        "",
+        "I. Kế hoạch Dinh dưỡng",
+        "",
+        *NUTRITION_GENERAL,
+        "4. Thực đơn gợi ý từng ngày",
+        *_fake_meal_days(rnd, 1, so_ngay),
+        *NUTRITION_SUBSTITUTES,
+        "",
+        "---",
+        "",
+        "II. Kế hoạch Tập luyện",
+        "",
+        *WORKOUT_GENERAL,
+        "2. Lịch trình tập luyện",
+        *_fake_workout_days(rnd, 1, so_ngay),
+        "",
+        "---",
+        "",
+        "III. Lưu ý chung",
+        "",
+        *NOTES,
+        "",
+        "---",
+    ]
+    return "\n".join(lines)
+
+
+def build_fake_plan_header():
+    """Phần chung của kế hoạch chia nhỏ (xem create_plan_header_prompt trong app.py)."""
+    return "\n".join([
+        "=== DINH DƯỠNG CHUNG ===", *NUTRITION_GENERAL,
+        "=== THAY THẾ THỰC PHẨM ===", *NUTRITION_SUBSTITUTES,
+        "=== TẬP LUYỆN CHUNG ===", *WORKOUT_GENERAL,
+        "=== LƯU Ý CHUNG ===", *NOTES,
+    ])
+
+
+def build_fake_day_range(first, last, seed=None):
+    """Thực đơn + lịch tập cho Ngày first..last (xem create_day_range_prompt trong app.py)."""
+    rnd = random.Random(seed)
+    return "\n".join([
+        "=== DINH DƯỠNG ===", *_fake_meal_days(rnd, first, last),
+        "=== TẬP LUYỆN ===", *_fake_workout_days(rnd, first, last),
+    ])
+
+
+class FakeAPIError(Exception):
+    """Lỗi giả lập, có .code giống google.api_core.exceptions."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message} (fake)")
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStreamResponse:
+    """
+    Giống phản hồi stream=True của Gemini: duyệt (for hoặc async for với generate_content_async)
+    để lấy từng chunk, sau đó có .text đầy đủ.
+    """
+
+    def __init__(self, text, delay, chunk_size=200, timeout=None):
+        self._full_text = text
+        self._delay = delay
+        self._chunk_size = chunk_size
+        self._timeout = timeout
+        self._parts = []
+
+    def _schedule(self):
+        """(số giây chờ, đoạn văn bản) cho từng chunk; đoạn None = quá hạn timeout."""
+        pieces = [self._full_text[i:i + self._chunk_size]
+                  for i in range(0, len(self._full_text), self._chunk_size)] or [""]
+        per_chunk = self._delay / len(pieces)
+        elapsed = 0.0
+        for piece in pieces:
+            elapsed += per_chunk
+            if self._timeout is not None and elapsed > self._timeout:
+                yield max(0.0, self._timeout - (elapsed - per_chunk)), None
+                return
+            yield per_chunk, piece
+
+    def __iter__(self):
+        for wait, piece in self._schedule():
+            time.sleep(wait)
+            if piece is None:
+                raise TimeoutError("504 Deadline Exceeded (fake)")
+            self._parts.append(piece)
+            yield FakeResponse(piece)
+
+    async def __aiter__(self):
+        for wait, piece in self._schedule():
+            await asyncio.sleep(wait)
+            if piece is None:
+                raise TimeoutError("504 Deadline Exceeded (fake)")
+            self._parts.append(piece)
+            yield FakeResponse(piece)
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+
+class FakeGeminiModel:
+    """Thay thế genai.GenerativeModel: cùng chữ ký generate_content(prompt)."""
+
+    def __init__(self, latency=None, jitter=None, distribution=None, error_rate=None, rate_limit_rate=None):
+        self.latency = FAKE_LLM_LATENCY if latency is None else latency
+        self.jitter = FAKE_LLM_JITTER if jitter is None else jitter
+        self.distribution = FAKE_LLM_DISTRIBUTION if distribution is None else distribution
+        self.error_rate = FAKE_LLM_ERROR_RATE if error_rate is None else error_rate
+        self.rate_limit_rate = FAKE_LLM_RATE_LIMIT_RATE if rate_limit_rate is None else rate_limit_rate
+
+    def _sample_delay(self):
+        if self.distribution == "fixed":
+            return self.latency
+        if self.distribution == "lognormal":
+            return random.lognormvariate(math.log(max(self.latency, 1e-3)), FAKE_LLM_SIGMA)
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _pick_failure(self, delay):
+        """Lỗi giả lập (số giây chờ trước khi báo, lỗi) hoặc None: 429 trả về gần như ngay, lỗi server sau một phần độ trễ."""
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            return min(delay, 0.05), FakeAPIError(429, "Resource has been exhausted (e.g. check quota).")
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay / 2, FakeAPIError(500, "An internal error has occurred.")
+        return None
+
+    def _maybe_fail(self, delay):
+        failure = self._pick_failure(delay)
+        if failure is not None:
+            time.sleep(failure[0])
+            raise failure[1]
+
+    def _so_ngay_from_prompt(self, prompt):
+        m = re.search(r"chi tiết trong (\d+) ngày", prompt, re.IGNORECASE)
+        return int(m.group(1)) if m else 7
+
+    def _build_text(self, prompt):
+        # Nhận diện loại prompt: phần chung, một khoảng ngày, hay cả kế hoạch
+        if "=== DINH DƯỠNG CHUNG ===" in prompt:
+            return build_fake_plan_header()
+        m = re.search(r"từ Ngày (\d+) đến Ngày (\d+)", prompt)
+        if m:
+            return build_fake_day_range(int(m.group(1)), int(m.group(2)))
+        return build_fake_plan(self._so_ngay_from_prompt(prompt))
+
+    def generate_content(self, prompt, stream=False, request_options=None, **kwargs):
+        delay = self._sample_delay()
+        self._maybe_fail(delay)
+        # Giống request_options={"timeout": ...} của SDK: quá hạn thì báo lỗi Deadline Exceeded
+        timeout = (request_options or {}).get("timeout")
+        text = self._build_text(prompt)
+        if stream:
+            return FakeStreamResponse(text, delay, timeout=timeout)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("504 Deadline Exceeded (fake)")
+        time.sleep(delay)
+        return FakeResponse(text)
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None, **kwargs):
+        """Giống GenerativeModel.generate_content_async: chờ bằng asyncio.sleep, không giữ luồng."""
+        delay = self._sample_delay()
+        failure = self._pick_failure(delay)
+        if failure is not None:
+            await asyncio.sleep(failure[0])
+            raise failure[1]
+        timeout = (request_options or {}).get("timeout")
+        text = self._build_text(prompt)
+        if stream:
+            return FakeStreamResponse(text, delay, timeout=timeout)
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError("504 Deadline Exceeded (fake)")
+        await asyncio.sleep(delay)
+        return FakeResponse(text)
@@ -0,0 +1,151 @@
+# forest_engine.py
+"""
+Suy luận RandomForest bằng NumPy thuần (không cần sklearn/pandas khi chạy web).
+
+Train/model.py gọi export_forest() để "làm phẳng" toàn bộ cây thành các mảng nút
+(feature, threshold, con trái/phải, phân bố lớp ở lá) rồi lưu thành .npz không nén.
+CompiledForest.load() ánh xạ (mmap) trực tiếp các mảng đó từ file nên các tiến trình
+worker dùng chung trang bộ nhớ và khởi động gần như tức thì.
+"""
+import zipfile
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def export_forest(clf, path, feature_names=None):
+    """Xuất RandomForestClassifier đã huấn luyện thành file .npz (không nén, mmap được)."""
+    n_classes = len(clf.classes_)
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    for est in clf.estimators_:
+        tree = est.tree_
+        n = tree.node_count
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        is_leaf = left == -1
+        # Đổi chỉ số con thành chỉ số tuyệt đối trong mảng chung; lá tự trỏ về chính nó
+        # để vòng lặp duyệt cây có thể chạy đủ max_depth bước mà không cần rẽ nhánh.
+        # children[2*i] là con trái, children[2*i + 1] là con phải của nút i.
+        own = np.arange(n, dtype=np.int32) + offset
+        children.append(np.stack([
+            np.where(is_leaf, own, left + offset),
+            np.where(is_leaf, own, right + offset),
+        ], axis=1).ravel())
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        # Chuẩn hóa phân bố lớp ở mỗi nút thành xác suất (giống predict_proba của sklearn)
+        val = tree.value[:, 0, :].astype(np.float64)
+        sums = val.sum(axis=1, keepdims=True)
+        sums[sums == 0] = 1.0
+        values.append((val / sums).astype(np.float32))
+        roots.append(offset)
+        offset += n
+
+    max_depth = max(est.tree_.max_depth for est in clf.estimators_)
+    if feature_names is None:
+        feature_names = list(getattr(clf, "feature_names_in_", []))
+
+    np.savez(
+        path,
+        format_version=np.array([FORMAT_VERSION], dtype=np.int32),
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        children=np.concatenate(children).astype(np.int32),
+        value=np.concatenate(values).reshape(-1, n_classes),
+        roots=np.array(roots, dtype=np.int32),
+        max_depth=np.array([max_depth], dtype=np.int32),
+        classes=np.asarray(clf.classes_),
+        feature_names=np.array(feature_names, dtype=str),
+    )
+
+
+def _mmap_npz_member(path, info):
+    """Ánh xạ một mảng .npy nằm trong file zip (lưu không nén) mà không đọc vào RAM."""
+    with open(path, "rb") as f:
+        # Bỏ qua local file header của zip để tới phần dữ liệu .npy
+        f.seek(info.header_offset)
+        header = f.read(30)
+        name_len = int.from_bytes(header[26:28], "little")
+        extra_len = int.from_bytes(header[28:30], "little")
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        data_offset = f.tell()
+    if dtype.hasobject or 0 in shape:
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=shape,
+                     order="F" if fortran_order else "C")
+
+
+def load_npz(path, mmap=True):
+    """Đọc các mảng trong .npz; với mmap=True, các mảng số lớn được ánh xạ thay vì sao chép."""
+    arrays = {}
+    with zipfile.ZipFile(path) as zf:
+        infos = {info.filename[:-4]: info for info in zf.infolist() if info.filename.endswith(".npy")}
+    with np.load(path, allow_pickle=False) as npz:
+        for name, info in infos.items():
+            arr = None
+            if mmap and info.compress_type == zipfile.ZIP_STORED:
+                arr = _mmap_npz_member(path, info)
+            arrays[name] = arr if arr is not None else npz[name]
+    return arrays
+
+
+class CompiledForest:
+    """Rừng đã làm phẳng; predict() nhận ndarray (n_samples, n_features)."""
+
+    def __init__(self, arrays):
+        if int(arrays["format_version"][0]) != FORMAT_VERSION:
+            raise ValueError("Phiên bản file forest không được hỗ trợ")
+        # np.asarray giữ nguyên vùng nhớ mmap nhưng bỏ lớp np.memmap (tránh chi phí mỗi lần take)
+        self.feature = np.asarray(arrays["feature"])
+        self.threshold = np.asarray(arrays["threshold"])
+        self.children = np.asarray(arrays["children"])
+        self.value = np.asarray(arrays["value"])
+        self.roots = np.asarray(arrays["roots"])
+        self.max_depth = int(arrays["max_depth"][0])
+        self.classes_ = np.asarray(arrays["classes"])
+        self.feature_names_in_ = np.asarray(arrays["feature_names"])
+        self.n_estimators = len(self.roots)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        return cls(load_npz(path, mmap=mmap))
+
+    def apply(self, X):
+        """Trả về chỉ số lá (n_samples, n_trees) cho từng mẫu trên từng cây."""
+        # sklearn so sánh đặc trưng ở độ chính xác float32 với ngưỡng float64
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_samples, n_features = X.shape
+        flat = X.ravel()
+        row_base = (np.arange(n_samples, dtype=np.intp) * n_features)[:, None]
+        nodes = np.tile(self.roots.astype(np.intp), (n_samples, 1))
+        for _ in range(self.max_depth):
+            values = np.take(flat, row_base + np.take(self.feature, nodes))
+            go_right = values > np.take(self.threshold, nodes)
+            nodes = np.take(self.children, 2 * nodes + go_right)
+        return nodes
+
+    def predict_proba(self, X):
+        return np.take(self.value, self.apply(X), axis=0).mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+if __name__ == "__main__":
+    # Chuyển đổi model .pkl đã có: python forest_engine.py model.pkl model.npz
+    import pickle
+    import sys
+
+    if len(sys.argv) != 3:
+        sys.exit("Cách dùng: python forest_engine.py <model.pkl> <output.npz>")
+    with open(sys.argv[1], "rb") as f:
+        clf = pickle.load(f)
+    export_forest(clf, sys.argv[2])
+    print(f"Đã xuất {len(clf.estimators_)} cây -> {sys.argv[2]}")
@@ -0,0 +1,130 @@
+# handoff_store.py
+"""
+Kho trạng thái phía server cho dữ liệu chuyển giao giữa các request (job sinh kế hoạch:
+form người dùng + BMI, tóm tắt hiển thị, trạng thái, rid kết quả).
+
+Cookie session chỉ giữ một token ngẫu nhiên; mọi worker đọc cùng một kho nên
+/analyzing/status và /result trả lời được dù request rơi vào tiến trình khác
+với tiến trình đã nhận form.
+
+- SQLiteHandoffStore: mặc định, dùng chung database của app (bảng handoff_state, migration v7).
+- MemoryHandoffStore: dict trong tiến trình (chỉ chạy một worker / kiểm thử).
+
+Dữ liệu lưu dạng JSON ở cả hai kho nên hành vi giống nhau. Mỗi bản ghi có hạn dùng:
+get() bỏ qua bản ghi hết hạn, sweep() xóa hẳn.
+"""
+import json
+import threading
+import time
+
+
+class MemoryHandoffStore:
+    def __init__(self):
+        self._items = {}            # token -> (payload JSON, expires_at)
+        self._lock = threading.Lock()
+
+    def put(self, token, data, ttl):
+        with self._lock:
+            self._items[token] = (json.dumps(data, ensure_ascii=False), time.time() + ttl)
+
+    def get(self, token):
+        with self._lock:
+            item = self._items.get(token)
+        if item is None or item[1] <= time.time():
+            return None
+        return json.loads(item[0])
+
+    def update(self, token, fields, ttl=None):
+        """Gộp fields vào bản ghi (ttl: gia hạn tính từ bây giờ); False nếu không còn bản ghi."""
+        with self._lock:
+            item = self._items.get(token)
+            if item is None or item[1] <= time.time():
+                return False
+            data = json.loads(item[0])
+            data.update(fields)
+            expires_at = item[1] if ttl is None else time.time() + ttl
+            self._items[token] = (json.dumps(data, ensure_ascii=False), expires_at)
+            return True
+
+    def delete(self, token):
+        with self._lock:
+            self._items.pop(token, None)
+
+    def sweep(self):
+        """Xóa các bản ghi đã hết hạn, trả về số bản ghi đã xóa."""
+        now = time.time()
+        with self._lock:
+            expired = [token for token, (_, expires_at) in self._items.items() if expires_at <= now]
+            for token in expired:
+                del self._items[token]
+        return len(expired)
+
+
+class SQLiteHandoffStore:
+    """connection: hàm trả về context manager cho một kết nối SQLite (vd. db_pool.connection)."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def put(self, token, data, ttl):
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO handoff_state (token, payload, expires_at) VALUES (?, ?, ?)",
+                (token, json.dumps(data, ensure_ascii=False), time.time() + ttl),
+            )
+            conn.commit()
+
+    def get(self, token):
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT payload FROM handoff_state WHERE token = ? AND expires_at > ?", (token, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, token, fields, ttl=None):
+        """Gộp fields vào bản ghi (ttl: gia hạn tính từ bây giờ); False nếu không còn bản ghi."""
+        with self.connection() as conn:
+            # BEGIN IMMEDIATE: đọc-gộp-ghi trong một giao dịch giữ khóa ghi
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT payload, expires_at FROM handoff_state WHERE token = ? AND expires_at > ?", (token, now)
+                ).fetchone()
+                if row is None:
+                    conn.rollback()
+                    return False
+                data = json.loads(row[0])
+                data.update(fields)
+                conn.execute(
+                    "UPDATE handoff_state SET payload = ?, expires_at = ? WHERE token = ?",
+                    (json.dumps(data, ensure_ascii=False), row[1] if ttl is None else now + ttl, token),
+                )
+                conn.commit()
+                return True
+            except Exception:
+                conn.rollback()
+                raise
+
+    def delete(self, token):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM handoff_state WHERE token = ?", (token,))
+            conn.commit()
+
+    def sweep(self):
+        """Xóa các bản ghi đã hết hạn, trả về số bản ghi đã xóa."""
+        with self.connection() as conn:
+            deleted = conn.execute("DELETE FROM handoff_state WHERE expires_at <= ?", (time.time(),)).rowcount
+            conn.commit()
+        return deleted
+
+
+def create_handoff_store(kind, connection=None):
+    """kind: "sqlite" (mặc định, cần connection) hoặc "memory"."""
+    if kind == "memory":
+        return MemoryHandoffStore()
+    if kind == "sqlite":
+        if connection is None:
+            raise ValueError("SQLiteHandoffStore cần hàm connection")
+        return SQLiteHandoffStore(connection)
+    raise ValueError(f"Loại handoff store không hỗ trợ: {kind}")
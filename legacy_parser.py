@@ -0,0 +1,262 @@
+# legacy_parser.py
+"""
+Pipeline regex cũ (trước plan_parser), tách khỏi app.py để không còn nằm trên đường xử lý request.
+
+Chỉ dùng để đối chiếu: lệnh `flask --app app check-parser-parity` và Bench/bench_parser.py.
+Giữ nguyên hành vi cũ (kể cả các lỗi đã sửa trong plan_parser), đừng tối ưu hay sửa ở đây.
+"""
+import re
+
+from plan_parser import markdown_like_to_html
+
+
+def parse_day_details_to_todos(nutrition_html, workout_html):
+    """Phân tích chi tiết ngày thành To-do List (dinh dưỡng + bài tập) và phần thông tin gợi ý."""
+
+    def parse_section(html, pattern, section_name):
+        """Phân tích 1 phần (dinh dưỡng hoặc bài tập)."""
+        todos = []
+        info_table = ""
+        clean_text = re.sub(r'<[^>]*>', '', html).strip()
+        last_end = 0
+
+        for match in pattern.finditer(clean_text):
+            title = match.group(1).strip()
+            content = match.group(2).strip()
+            todos.append(f"{title}: {content}")
+            last_end = match.end()
+
+        remaining = clean_text[last_end:].strip()
+        if remaining:
+            info_table = (
+                f"<h6>Thông tin {section_name} khác:</h6>"
+                f"<div class='alert alert-secondary'>{remaining}</div>"
+            )
+        return todos, info_table
+
+    # =======================
+    # 1️⃣ DINH DƯỠNG
+    # =======================
+    nutrition_pattern = re.compile(
+        r'(?i)^\s*(Sáng|Phụ sáng|Trưa|Phụ chiều|Tối|Phụ tối|Bữa sáng|Bữa phụ 1|Bữa trưa|Bữa phụ 2|Bữa tối|Bữa phụ 3|Bữa phụ tối)\s*[:\.]\s*(.*?)(?=\n\S|$)',
+        re.MULTILINE | re.DOTALL
+    )
+    nutrition_todos, nutrition_info_table = parse_section(
+        nutrition_html, nutrition_pattern, "dinh dưỡng"
+    )
+
+    # =======================
+    # 2️⃣ BÀI TẬP
+    # =======================
+    # Cập nhật: cho phép nhận cả Khởi động, Giãn cơ, Bài tập và từng động tác
+    workout_text = re.sub(r'<[^>]*>', '', workout_html).strip()
+
+    workout_todos = []
+    workout_info_lines = []
+
+    
+    exercise_pattern = re.compile(
+        r'(?i)^\s*([A-ZĐa-zÀ-ỹ0-9\s\-\(\)]+?)\s*[:\.]\s*(.+)$',
+        re.MULTILINE
+    )
+
+    lines = [line.strip() for line in workout_text.splitlines() if line.strip()]
+
+    for line in lines:
+        # Nếu là tiêu đề phần (VD: "Tập Toàn thân", "Bài tập:", "Strength")
+        if re.match(r'(?i)^(tập|strength|bài tập|lưu ý)', line):
+            workout_info_lines.append(line)
+        # Nếu khớp pattern "Tên: mô tả" → To-do
+        elif exercise_pattern.match(line):
+            match = exercise_pattern.match(line)
+            title = match.group(1).strip()
+            content = match.group(2).strip()
+            workout_todos.append(f"{title}: {content}")
+        # Nếu dòng thông tin thêm
+        else:
+            workout_info_lines.append(line)
+
+    workout_info_table = ""
+    if workout_info_lines:
+        workout_info_table = (
+            "<h6>Khác:</h6>"
+            "<div class='alert alert-secondary'>" +
+            " ".join(workout_info_lines) +
+            "</div>"
+        )
+
+ 
+    final_todos = nutrition_todos + workout_todos
+    return final_todos, nutrition_info_table, workout_info_table
+
+
+def parse_full_plan_sections(raw_text):
+    """
+    Tách raw_text thành 3 phần chính (Dinh dưỡng, Tập luyện, Lưu ý)
+    và trích xuất chi tiết hàng ngày từ các khối chính đó.
+    """
+    if not raw_text:
+        return "", "", "", []
+    
+    # Chuẩn hóa văn bản
+    text = raw_text.replace('\r\n', '\n').replace('\r', '\n').strip()
+    
+    # 1. Tách các phần chính I, II, III (Dùng regex mạnh mẽ hơn)
+    parts = re.split(r'\n---\n\n*(I\.\s*Kế hoạch Dinh dưỡng|II\.\s*Kế hoạch Tập luyện|III\.\s*Lưu ý chung)', text, flags=re.IGNORECASE)
+    
+    header_text = parts[0].strip() if len(parts) > 0 else ""
+    
+    # Ghép các phần lại thành khối lớn, vì regex split sẽ tách tiêu đề ra khỏi nội dung
+    nutrition_block = ""
+    workout_block = ""
+    notes_block = ""
+    
+    for i in range(1, len(parts)):
+        if "I. Kế hoạch Dinh dưỡng" in parts[i]:
+            if i + 1 < len(parts):
+                nutrition_block = "I. Kế hoạch Dinh dưỡng\n\n" + parts[i+1].strip()
+        elif "II. Kế hoạch Tập luyện" in parts[i]:
+            if i + 1 < len(parts):
+                workout_block = "II. Kế hoạch Tập luyện\n\n" + parts[i+1].strip()
+        elif "III. Lưu ý chung" in parts[i]:
+            if i + 1 < len(parts):
+                notes_block = "III. Lưu ý chung\n\n" + parts[i+1].strip()
+
+    # 2. Tách nội dung tổng quan (Khối Dinh dưỡng và Tập luyện)
+    
+    # --- Dinh dưỡng: Tách phần Nguyên tắc/Mục tiêu chung khỏi Thực đơn chi tiết
+    # Giả định: Thực đơn chi tiết bắt đầu từ "Ngày 1:" hoặc mục số 4.
+    nutrition_general_content = re.split(r'(?i)\n*(Ngày\s*1\s*:|4\.\s*Thực đơn gợi ý từng ngày)', nutrition_block)[0].replace("I. Kế hoạch Dinh dưỡng\n\n", "").strip()
+    
+    # --- Tập luyện: Tách phần Nguyên tắc chung khỏi Lịch trình chi tiết
+    # Giả định: Lịch trình chi tiết bắt đầu từ "Ngày 1:" hoặc mục số 2.
+    workout_general_content = re.split(r'(?i)\n*(Ngày\s*1\s*:|2\.\s*Lịch trình tập luyện)', workout_block)[0].replace("II. Kế hoạch Tập luyện\n\n", "").strip()
+    
+    # 3. Trích xuất chi tiết từng ngày
+    days_data = {}
+    
+    # Pattern 1: Tìm "Ngày X:" và nội dung tương ứng (Tiêu đề ngày đơn)
+    # LƯU Ý: Đã cải thiện pattern để bao gồm dấu xuống dòng sau tiêu đề ngày.
+    day_pattern_single = re.compile(r'(?i)\bNgày\s*([0-9]{1,2})\s*:\s*\n*(.*?)(?=\bNgày\s*[0-9]{1,2}\s*:|\bNgày\s*[0-9]{1,2}\s*đến|$|\n---\n)', re.DOTALL)
+    
+    # Pattern tìm Khối lặp (Ngày X đến Ngày Y:)
+    repeat_pattern = re.compile(r'(?i)\bNgày\s*([0-9]{1,2})\s*đến\s*Ngày\s*([0-9]{1,2})\s*:\s*\n*(.*?)(?=\bNgày\s*[0-9]{1,2}\s*:|\n---\n|$)', re.DOTALL)
+
+    last_single_day_data = {'nutrition': "", 'workout': ""}
+
+    # --- Trích xuất phần chi tiết ngày từ khối Dinh dưỡng ---
+    # PHIÊN BẢN SỬA LỖI: Tìm nội dung chi tiết bắt đầu từ mục 4 hoặc Ngày 1:
+    nutrition_daily_part = re.search(r'(?i)(4\.\s*Thực đơn gợi ý từng ngày\s*\n*|\bNgày\s*1\s*:\s*\n*)(.*?)$', nutrition_block, re.DOTALL)
+    if nutrition_daily_part:
+        # Nếu tìm thấy mục 4, lấy nội dung sau đó. Nếu không (tức là chỉ tìm thấy Ngày 1:), lấy nội dung sau Ngày 1:
+        daily_text = nutrition_daily_part.group(2).strip()
+        
+        # 1. Xử lý các ngày đơn (Ngày 1:, Ngày 2:, ...)
+        matches = day_pattern_single.findall(daily_text)
+        for day_num_str, content in matches:
+            day_num = int(day_num_str)
+            days_data.setdefault(day_num, {'day': day_num, 'nutrition_html': '', 'workout_html': ''})
+            
+            nutrition_daily_content = content.strip()
+            days_data[day_num]['nutrition_html'] = markdown_like_to_html(nutrition_daily_content)
+            
+            # Lưu lại nội dung của ngày đơn gần nhất
+            last_single_day_data['nutrition'] = nutrition_daily_content
+
+        # 2. Xử lý các khối lặp (Ngày X đến Ngày Y:)
+        repeat_matches = repeat_pattern.findall(daily_text)
+        for start_num_str, end_num_str, content in repeat_matches:
+            start_num = int(start_num_str)
+            end_num = int(end_num_str)
+            
+            for day_num in range(start_num, end_num + 1):
+                days_data.setdefault(day_num, {'day': day_num, 'nutrition_html': '', 'workout_html': ''})
+                
+                # Tự động tìm ngày cơ sở (thường là ngày 1 nếu là khối 8-14)
+                base_day_num = 1 
+                if start_num > 7:
+                    base_day_num = start_num - 7
+                
+                base_day_content = days_data.get(base_day_num, {}).get('nutrition_html', "")
+
+                repeat_note = f"*LƯU Ý: Đây là lịch dinh dưỡng lặp lại theo nguyên tắc/thực đơn của Ngày {base_day_num} như đã đề cập trong mục **Ngày {start_num} đến Ngày {end_num}**:\n"
+                
+                if base_day_content:
+                    # Nếu Ngày cơ sở đã có nội dung, dùng nó
+                    days_data[day_num]['nutrition_html'] = markdown_like_to_html(repeat_note) + base_day_content
+                elif content:
+                    # Nếu không, dùng nội dung mô tả khối lặp
+                    days_data[day_num]['nutrition_html'] = markdown_like_to_html(repeat_note + content.strip())
+
+
+    # --- Trích xuất phần chi tiết ngày từ khối Tập luyện ---
+    # PHIÊN BẢN SỬA LỖI: Tìm nội dung chi tiết bắt đầu từ mục 2 hoặc Ngày 1:
+    workout_daily_part = re.search(r'(?i)(2\.\s*Lịch trình tập luyện\s*\n*|\bNgày\s*1\s*:\s*\n*)(.*?)$', workout_block, re.DOTALL)
+    if workout_daily_part:
+        daily_text = workout_daily_part.group(2).strip()
+
+        # 1. Xử lý các ngày đơn (Ngày 1:, Ngày 2:, ...)
+        matches = day_pattern_single.findall(daily_text)
+        for day_num_str, content in matches:
+            day_num = int(day_num_str)
+            days_data.setdefault(day_num, {'day': day_num, 'nutrition_html': '', 'workout_html': ''})
+            
+            workout_daily_content = content.strip()
+            days_data[day_num]['workout_html'] = markdown_like_to_html(workout_daily_content)
+            
+            # Lưu lại nội dung của ngày đơn gần nhất
+            last_single_day_data['workout'] = workout_daily_content
+            
+        # 2. Xử lý các khối lặp (Ngày X đến Ngày Y:)
+        repeat_matches = repeat_pattern.findall(daily_text)
+        for start_num_str, end_num_str, content in repeat_matches:
+            start_num = int(start_num_str)
+            end_num = int(end_num_str)
+            
+            for day_num in range(start_num, end_num + 1):
+                days_data.setdefault(day_num, {'day': day_num, 'nutrition_html': '', 'workout_html': ''})
+                
+                base_day_num = 1
+                if start_num > 7:
+                    base_day_num = start_num - 7
+                
+                base_day_content = days_data.get(base_day_num, {}).get('workout_html', "")
+
+                repeat_note = f"*LƯU Ý: Đây là lịch tập luyện lặp lại theo Ngày {base_day_num} như đã đề cập trong mục **Ngày {start_num} đến Ngày {end_num}**:\n"
+                
+                if base_day_content:
+                    days_data[day_num]['workout_html'] = markdown_like_to_html(repeat_note) + base_day_content
+                elif content:
+                    days_data[day_num]['workout_html'] = markdown_like_to_html(repeat_note + content.strip())
+
+
+    days_list = sorted(days_data.values(), key=lambda x: x['day'])
+    
+    return (
+        markdown_like_to_html(nutrition_general_content), 
+        markdown_like_to_html(workout_general_content), 
+        markdown_like_to_html(notes_block.replace("III. Lưu ý chung\n\n", "").strip()), # Chỉ lấy nội dung Lưu ý chung
+        days_list
+    )
+
+
+def legacy_build_parsed_plan(raw_text):
+    """Ghép hai hàm trên thành cùng cấu trúc với plan_parser.build_plan."""
+    nutrition_html, workout_html, notes_html, days_list = parse_full_plan_sections(raw_text)
+    days = []
+    for d in days_list:
+        todos, nutri_info, workout_info = parse_day_details_to_todos(d['nutrition_html'], d['workout_html'])
+        days.append({
+            'day': d['day'],
+            'nutrition_html': d['nutrition_html'],
+            'workout_html': d['workout_html'],
+            'todos': todos,
+            'nutri_info': nutri_info,
+            'workout_info': workout_info,
+        })
+    return {
+        'nutrition_html': nutrition_html,
+        'workout_html': workout_html,
+        'notes_html': notes_html,
+        'days': days,
+    }
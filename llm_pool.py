@@ -0,0 +1,238 @@
+# llm_pool.py
+"""
+Bể API key cho Gemini: mỗi key một client riêng (không dùng genai.configure toàn cục),
+theo dõi độ trễ, lỗi và tín hiệu hết quota (429) của từng key.
+
+- Key lỗi liên tiếp hoặc bị 429 sẽ bị "ngắt mạch" (circuit breaker) trong một khoảng
+  thời gian tăng dần; hết thời gian thì cho một request thử (half-open).
+- Mỗi key có token bucket giới hạn số request/phút để không tự gây ra 429.
+- acquire() chọn key khỏe đang ít tải nhất (số request đang chạy x độ trễ trung bình).
+"""
+import threading
+import time
+from collections import deque
+
+# Trọng số EWMA cho độ trễ (càng lớn càng phản ứng nhanh với thay đổi gần đây)
+EWMA_ALPHA = 0.3
+# Độ trễ giả định cho key chưa có số liệu (giây)
+DEFAULT_LATENCY = 10.0
+
+
+def is_rate_limit_error(exc):
+    """Nhận diện lỗi 429 / hết quota mà không phụ thuộc cứng vào google.api_core."""
+    if getattr(exc, "code", None) == 429:
+        return True
+    if type(exc).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    text = str(exc)
+    return "429" in text or "quota" in text.lower()
+
+
+def mask_key(key):
+    return f"{key[:6]}…{key[-4:]}" if len(key) > 12 else "***"
+
+
+class TokenBucket:
+    """Giới hạn tốc độ: rate token/giây, tối đa capacity token tích lũy."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now):
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class KeyState:
+    """
+    Trạng thái sức khỏe của một key; chỉ đọc/ghi khi giữ khóa của GeminiKeyPool.
+    Client được tạo ở lần dùng đầu tiên (client_factory có thể import SDK nặng).
+    """
+
+    def __init__(self, key, client_factory, bucket):
+        self.key = key
+        self.name = mask_key(key)
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.bucket = bucket
+        self.inflight = 0
+        self.ewma_latency = None
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.consecutive_failures = 0
+        self.trips = 0              # số lần ngắt mạch liên tiếp (để tăng thời gian chờ)
+        self.open_until = 0.0       # > now: đang ngắt mạch
+        self.probing = False        # đang có request thử sau khi hết thời gian ngắt mạch
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory(self.key)
+        return self._client
+
+    @property
+    def client_ready(self):
+        return self._client is not None
+
+    def snapshot(self, now):
+        return {
+            "key": self.name,
+            "inflight": self.inflight,
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "circuit_open_for": round(max(0.0, self.open_until - now), 1),
+            "client_ready": self.client_ready,
+        }
+
+
+class GeminiKeyPool:
+    def __init__(self, keys, client_factory, rpm=10, burst=2, failure_threshold=3,
+                 base_backoff=5.0, max_backoff=300.0, rate_limit_backoff=30.0, max_wait=10.0):
+        if not keys:
+            raise ValueError("Cần ít nhất một API key")
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.rate_limit_backoff = rate_limit_backoff
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self.states = [KeyState(k, client_factory, TokenBucket(rpm / 60.0, burst)) for k in keys]
+
+    def _expected_latency(self, state):
+        if state.ewma_latency is not None:
+            return state.ewma_latency
+        known = [s.ewma_latency for s in self.states if s.ewma_latency is not None]
+        return sum(known) / len(known) if known else DEFAULT_LATENCY
+
+    def _healthy(self, exclude, now):
+        return [s for s in self.states if s.key not in exclude and s.open_until <= now and not s.probing]
+
+    def ready_in(self, exclude=()):
+        """
+        Số giây tới khi có key khỏe (ngoài exclude) còn token, None nếu không còn key khỏe.
+        Dùng cho bên gọi không được chặn luồng (event loop): acquire(timeout=0) rồi tự chờ.
+        """
+        with self._cond:
+            now = time.monotonic()
+            healthy = self._healthy(exclude, now)
+            if not healthy:
+                return None
+            return min(s.bucket.wait_time(now) for s in healthy)
+
+    def available_tokens(self):
+        """Số lệnh gọi có thể bắt đầu ngay (tổng token nguyên của các key khỏe)."""
+        with self._cond:
+            now = time.monotonic()
+            healthy = self._healthy((), now)
+            for s in healthy:
+                s.bucket._refill(now)
+            return sum(int(s.bucket.tokens) for s in healthy)
+
+    def acquire(self, exclude=(), timeout=None):
+        """
+        Lấy key tốt nhất chưa nằm trong exclude; chờ tối đa timeout giây nếu mọi key khỏe
+        đều đang hết token. Trả về None nếu không còn key nào dùng được.
+        """
+        deadline = time.monotonic() + (self.max_wait if timeout is None else timeout)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                healthy = self._healthy(exclude, now)
+                if not healthy:
+                    return None
+                ready = [s for s in healthy if s.bucket.wait_time(now) == 0.0]
+                if ready:
+                    best = min(ready, key=lambda s: ((s.inflight + 1) * self._expected_latency(s), s.inflight))
+                    best.bucket.try_take(now)
+                    best.inflight += 1
+                    # Key vừa hết thời gian ngắt mạch: chỉ cho một request thử
+                    best.probing = best.trips > 0
+                    return best
+                wait = min(s.bucket.wait_time(now) for s in healthy)
+                if now + wait > deadline:
+                    return None
+                self._cond.wait(wait)
+
+    def release(self, state, latency=None, error=None, cancelled=False):
+        """
+        Trả key về bể kèm kết quả lần gọi (latency khi thành công, error khi thất bại).
+        cancelled=True: lần gọi bị hủy giữa chừng (thua khi hedging) nên không tính vào thống kê.
+        """
+        with self._cond:
+            state.inflight -= 1
+            state.probing = False
+            now = time.monotonic()
+            if cancelled:
+                pass
+            elif error is None:
+                state.successes += 1
+                state.consecutive_failures = 0
+                state.trips = 0
+                if latency is not None:
+                    state.ewma_latency = latency if state.ewma_latency is None else (
+                        EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * state.ewma_latency)
+            elif is_rate_limit_error(error):
+                state.failures += 1
+                state.rate_limited += 1
+                state.trips += 1
+                state.open_until = now + min(self.max_backoff, self.rate_limit_backoff * 2 ** (state.trips - 1))
+            else:
+                state.failures += 1
+                state.consecutive_failures += 1
+                if state.consecutive_failures >= self.failure_threshold or state.trips > 0:
+                    state.trips += 1
+                    state.consecutive_failures = 0
+                    state.open_until = now + min(self.max_backoff, self.base_backoff * 2 ** (state.trips - 1))
+            self._cond.notify_all()
+
+    def warm_clients(self):
+        """Tạo trước client cho mọi key (warmup), trả về số client đã sẵn sàng."""
+        for state in self.states:
+            state.client
+        return len(self.states)
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return [s.snapshot(now) for s in self.states]
+
+
+class LatencyWindow:
+    """Lưu N độ trễ gần nhất cho từng loại lệnh gọi để tính phân vị (vd. p95 cho hedging)."""
+
+    def __init__(self, maxlen=200):
+        self.maxlen = maxlen
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds):
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=self.maxlen)).append(seconds)
+
+    def percentile(self, kind, q, min_samples=20):
+        """Phân vị q (0-1) hoặc None nếu chưa đủ min_samples mẫu."""
+        with self._lock:
+            samples = sorted(self._samples.get(kind, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
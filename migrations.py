@@ -0,0 +1,310 @@
+# migrations.py
+"""
+Quản lý schema database theo phiên bản (thay cho việc chạy init_db.py một lần).
+
+Phiên bản hiện tại lưu trong PRAGMA user_version. Mỗi migration là một danh sách
+bước (câu SQL hoặc hàm nhận conn) và được áp dụng trong một giao dịch riêng.
+Các migration đầu dùng IF NOT EXISTS nên database cũ tạo bằng init_db.py vẫn nâng cấp được.
+"""
+import json
+import sqlite3
+
+# Số to-do tối đa mỗi ngày lưu được trong bitmask (INTEGER 64-bit có dấu của SQLite)
+MAX_TODOS_PER_DAY = 62
+
+
+def _progress_to_bitmask(conn):
+    """Chuyển user_plan_progress từ danh sách JSON sang bitmask số nguyên + số mục đã xong."""
+    conn.execute("""
+        CREATE TABLE user_plan_progress_new (
+            user_plan_id INTEGER NOT NULL,
+            day_number INTEGER NOT NULL,
+            done_mask INTEGER NOT NULL DEFAULT 0,   -- bit i = to-do thứ i đã hoàn thành
+            done_count INTEGER NOT NULL DEFAULT 0,
+            total_todos INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_plan_id, day_number),
+            FOREIGN KEY(user_plan_id) REFERENCES user_plans(id)
+        ) WITHOUT ROWID
+    """)
+    rows = conn.execute("SELECT user_plan_id, day_number, completed_todos FROM user_plan_progress").fetchall()
+    converted = []
+    for plan_id, day_number, completed_json in rows:
+        try:
+            flags = json.loads(completed_json or "[]")
+        except ValueError:
+            flags = []
+        flags = flags[:MAX_TODOS_PER_DAY]
+        mask = sum(1 << i for i, done in enumerate(flags) if done)
+        converted.append((plan_id, day_number, mask, sum(1 for done in flags if done), len(flags)))
+    conn.executemany("INSERT INTO user_plan_progress_new VALUES (?, ?, ?, ?, ?)", converted)
+    conn.execute("DROP TABLE user_plan_progress")
+    conn.execute("ALTER TABLE user_plan_progress_new RENAME TO user_plan_progress")
+
+
+# Tổng hợp tiến độ theo tuần (tuần 1 = ngày 1-7 của lộ trình), cập nhật bằng trigger trong
+# cùng câu lệnh ghi user_plan_progress nên không bao giờ lệch với dữ liệu gốc.
+WEEK_OF_DAY = "((NEW.day_number - 1) / 7 + 1)"
+DAY_BIT = "(1 << ((NEW.day_number - 1) % 7))"
+DAY_DONE = "(NEW.total_todos > 0 AND NEW.done_count = NEW.total_todos)"
+
+
+def _weekly_progress(conn):
+    conn.execute("""
+        CREATE TABLE plan_progress_weekly (
+            user_plan_id INTEGER NOT NULL,
+            week_number INTEGER NOT NULL,
+            todos_total INTEGER NOT NULL DEFAULT 0,      -- số to-do của tuần (gán lúc xác nhận lộ trình)
+            todos_completed INTEGER NOT NULL DEFAULT 0,
+            days_mask INTEGER NOT NULL DEFAULT 0,        -- bit i = ngày thứ i của tuần đã xong hết to-do
+            PRIMARY KEY (user_plan_id, week_number),
+            FOREIGN KEY(user_plan_id) REFERENCES user_plans(id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_progress_weekly_insert AFTER INSERT ON user_plan_progress
+        BEGIN
+            INSERT INTO plan_progress_weekly (user_plan_id, week_number, todos_completed, days_mask)
+            VALUES (NEW.user_plan_id, {WEEK_OF_DAY}, NEW.done_count, CASE WHEN {DAY_DONE} THEN {DAY_BIT} ELSE 0 END)
+            ON CONFLICT(user_plan_id, week_number) DO UPDATE SET
+                todos_completed = todos_completed + excluded.todos_completed,
+                days_mask = days_mask | excluded.days_mask;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_progress_weekly_update AFTER UPDATE ON user_plan_progress
+        BEGIN
+            UPDATE plan_progress_weekly SET
+                todos_completed = todos_completed + NEW.done_count - OLD.done_count,
+                days_mask = (days_mask & ~{DAY_BIT}) | CASE WHEN {DAY_DONE} THEN {DAY_BIT} ELSE 0 END
+            WHERE user_plan_id = NEW.user_plan_id AND week_number = {WEEK_OF_DAY};
+        END
+    """)
+    # Dữ liệu cũ: số to-do mỗi tuần (trong khoảng ngày của lộ trình) + tiến độ đã có
+    conn.execute("""
+        INSERT INTO plan_progress_weekly (user_plan_id, week_number, todos_total)
+        SELECT up.id, (pt.day_number - 1) / 7 + 1, COUNT(*)
+        FROM user_plans up JOIN plan_todos pt ON pt.ai_result_id = up.ai_result_id
+        WHERE pt.day_number BETWEEN 1 AND julianday(up.end_date) - julianday(up.start_date) + 1
+        GROUP BY up.id, (pt.day_number - 1) / 7 + 1
+    """)
+    conn.execute("""
+        INSERT INTO plan_progress_weekly (user_plan_id, week_number, todos_completed, days_mask)
+        SELECT user_plan_id, (day_number - 1) / 7 + 1, SUM(done_count),
+               SUM(CASE WHEN total_todos > 0 AND done_count = total_todos THEN 1 << ((day_number - 1) % 7) ELSE 0 END)
+        FROM user_plan_progress WHERE day_number >= 1
+        GROUP BY user_plan_id, (day_number - 1) / 7 + 1
+        ON CONFLICT(user_plan_id, week_number) DO UPDATE SET
+            todos_completed = excluded.todos_completed,
+            days_mask = excluded.days_mask
+    """)
+
+
+MIGRATIONS = [
+    (1, "Bảng gốc: users, ai_results, feedbacks, user_plans, user_plan_progress", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ho_va_ten TEXT,
+            email TEXT UNIQUE,
+            mat_khau TEXT,
+            tuoi INTEGER,
+            gioi_tinh TEXT,
+            chieu_cao_cm REAL,
+            can_nang_kg REAL,
+            calo_nap REAL,
+            calo_tieu_hao REAL,
+            thoi_gian_ngu REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # Bảng lưu kết quả AI (lưu nguyên bản plan + các thông số cơ bản)
+        """
+        CREATE TABLE IF NOT EXISTS ai_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            ho_va_ten TEXT,
+            tuoi INTEGER,
+            gioi_tinh TEXT,
+            chieu_cao_cm REAL,
+            can_nang_kg REAL,
+            calo_nap REAL,
+            calo_tieu_hao REAL,
+            thoi_gian_ngu REAL,
+            bmi REAL,
+            so_ngay INTEGER,
+            tinh_trang TEXT,
+            plan_text LONGTEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS feedbacks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            fullname TEXT,
+            rating INTEGER,
+            comment TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            plan_name TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            ai_result_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(ai_result_id) REFERENCES ai_results(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_plan_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_plan_id INTEGER NOT NULL,
+            day_number INTEGER NOT NULL,
+            completed_todos TEXT,  -- JSON list of booleans
+            all_completed INTEGER DEFAULT 0,
+            FOREIGN KEY(user_plan_id) REFERENCES user_plans(id),
+            UNIQUE(user_plan_id, day_number)
+        )
+        """,
+    ]),
+    (2, "Cache kế hoạch AI theo hồ sơ đã chuẩn hóa", [
+        """
+        CREATE TABLE IF NOT EXISTS plan_cache (
+            cache_key TEXT PRIMARY KEY,
+            template_version INTEGER NOT NULL,
+            plan_text LONGTEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hit_count INTEGER DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_plan_cache_last_used ON plan_cache(last_used_at)",
+    ]),
+    (3, "Kế hoạch đã phân tích sẵn: plan_sections, plan_days, plan_todos", [
+        """
+        CREATE TABLE IF NOT EXISTS plan_sections (
+            ai_result_id INTEGER PRIMARY KEY,
+            schema_version INTEGER NOT NULL,
+            nutrition_html TEXT,
+            workout_html TEXT,
+            notes_html TEXT,
+            FOREIGN KEY(ai_result_id) REFERENCES ai_results(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS plan_days (
+            ai_result_id INTEGER NOT NULL,
+            day_number INTEGER NOT NULL,
+            nutrition_html TEXT,
+            workout_html TEXT,
+            nutri_info TEXT,
+            workout_info TEXT,
+            PRIMARY KEY (ai_result_id, day_number),
+            FOREIGN KEY(ai_result_id) REFERENCES ai_results(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS plan_todos (
+            ai_result_id INTEGER NOT NULL,
+            day_number INTEGER NOT NULL,
+            todo_index INTEGER NOT NULL,
+            todo_text TEXT NOT NULL,
+            PRIMARY KEY (ai_result_id, day_number, todo_index),
+            FOREIGN KEY(ai_result_id) REFERENCES ai_results(id)
+        )
+        """,
+    ]),
+    (4, "Chỉ mục cho trang profile và current_plan", [
+        # profile: WHERE user_id = ? ORDER BY created_at DESC, chỉ đọc id/created_at/tinh_trang
+        # -> chỉ mục bao phủ (covering), không cần đọc bảng và không cần sắp xếp
+        "CREATE INDEX IF NOT EXISTS idx_ai_results_user_created ON ai_results(user_id, created_at, tinh_trang)",
+        # current_plan: WHERE user_id = ? ORDER BY created_at DESC LIMIT 1
+        "CREATE INDEX IF NOT EXISTS idx_user_plans_user_created ON user_plans(user_id, created_at)",
+    ]),
+    (5, "Tiến độ to-do dạng bitmask (done_mask, done_count, total_todos)", [_progress_to_bitmask]),
+    (6, "Phiên bản tiến độ của lộ trình (khóa cache trang current_plan)", [
+        # Tăng mỗi lần ghi tiến độ: trang đã render theo phiên bản cũ tự hết hiệu lực
+        "ALTER TABLE user_plans ADD COLUMN progress_version INTEGER NOT NULL DEFAULT 0",
+    ]),
+    (7, "Kho trạng thái chuyển giao giữa các request (handoff_state)", [
+        """
+        CREATE TABLE IF NOT EXISTS handoff_state (
+            token TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,      -- JSON
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_handoff_state_expires ON handoff_state(expires_at)",
+    ]),
+    (8, "Tổng hợp tiến độ theo tuần (plan_progress_weekly + trigger)", [
+        _weekly_progress,
+        # Cập nhật số to-do mỗi tuần cho các lộ trình dùng một ai_results vừa được phân tích lại
+        "CREATE INDEX IF NOT EXISTS idx_user_plans_ai_result ON user_plans(ai_result_id)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Áp dụng các migration còn thiếu, trả về danh sách (version, mô tả) đã áp dụng."""
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version > target:
+            break
+        # BEGIN IMMEDIATE: nhiều tiến trình khởi động cùng lúc sẽ chờ nhau thay vì chạy trùng
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
+
+
+def check_query_plans(conn, checks):
+    """
+    Kiểm tra EXPLAIN QUERY PLAN của các truy vấn nóng.
+    checks: danh sách (tên, sql, params, tên chỉ mục mong đợi).
+    Trả về danh sách lỗi (rỗng nếu mọi truy vấn đều dùng đúng chỉ mục, không quét bảng/sắp xếp tạm).
+    """
+    problems = []
+    for name, sql, params, index_name in checks:
+        details = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        plan = " | ".join(details)
+        if index_name not in plan:
+            problems.append(f"{name}: không dùng chỉ mục {index_name} ({plan})")
+        if any(d.startswith("SCAN") for d in details) or "USE TEMP B-TREE" in plan:
+            problems.append(f"{name}: quét bảng hoặc sắp xếp tạm ({plan})")
+    return problems
+
+
+if __name__ == "__main__":
+    import sys
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "database.db"
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    for version, description in migrate(conn):
+        print(f"  -> v{version}: {description}")
+    print(f"Schema {db_path} ở phiên bản {get_version(conn)}")
+    conn.close()
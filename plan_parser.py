@@ -0,0 +1,402 @@
+# plan_parser.py
+"""
+Phân tích plan_text của Gemini trong MỘT lượt duyệt theo dòng (máy trạng thái).
+
+parse_plan() dựng cây PlanDocument (3 phần, mỗi phần có nội dung chung và các mục
+"Ngày N:" / "Ngày X đến Ngày Y:"), sau đó build_plan() render HTML và tách to-do từ
+chính cây đó. Mọi biểu thức chính quy chỉ chạy trên từng dòng và không có lượng từ lồng
+nhau, nên thời gian chạy tuyến tính theo độ dài văn bản kể cả khi đầu ra của LLM bị lỗi.
+
+Kết quả giống parse_full_plan_sections + parse_day_details_to_todos (bản cũ trong legacy_parser.py,
+giữ lại để so sánh bằng `flask --app app check-parser-parity`), trừ ba chỗ sửa có chủ đích:
+- Ngày có 3 chữ số trở lên (kế hoạch > 99 ngày) được nhận diện.
+- Khi không có dòng "4. Thực đơn..." / "2. Lịch trình..." thì Ngày 1 không bị mất.
+- Khối lặp lấy nội dung gốc của ngày cơ sở (không kèm ghi chú lặp của khối khác), nên kế hoạch
+  lặp theo tuần không bị dồn ghi chú qua từng tuần.
+Số ngày vượt MAX_PLAN_DAYS (vd. "Ngày 2 đến Ngày 1000000:") bị bỏ qua / cắt bớt.
+"""
+import re
+from dataclasses import dataclass, field
+
+LIST_PATTERN = re.compile(r"^(\*|-|•|\d+\.)\s+")
+BOLD_PATTERN = re.compile(r"\*\*(.+?)\*\*")
+
+SECTION_HEADER = re.compile(
+    r"(?i)^(I\.\s*Kế hoạch Dinh dưỡng|II\.\s*Kế hoạch Tập luyện|III\.\s*Lưu ý chung)"
+)
+SECTION_KEYS = {"I": "nutrition", "II": "workout", "III": "notes"}
+# Dòng bắt đầu phần chi tiết theo ngày của từng phần
+DAILY_START = {
+    "nutrition": re.compile(r"(?i)4\.\s*Thực đơn gợi ý từng ngày|\bNgày\s*1\s*:"),
+    "workout": re.compile(r"(?i)2\.\s*Lịch trình tập luyện|\bNgày\s*1\s*:"),
+}
+# Số ngày lớn nhất được dựng (kế hoạch dài nhất là một năm); ngày lớn hơn bị bỏ qua
+MAX_PLAN_DAYS = 366
+# "Ngày N:" | "Ngày X đến Ngày Y:" | "Ngày X đến" (không đủ -> chỉ kết thúc mục trước)
+# Tối đa 9 chữ số: số dài hơn không phải là ngày (và int() không phải đổi chuỗi số khổng lồ)
+DAY_TOKEN = re.compile(r"(?i)\bNgày\s*(\d{1,9})\s*(?:(:)|đến(?:\s*Ngày\s*(\d{1,9})\s*:)?)")
+
+# "Tên bữa:" / "Tên bữa." ở đầu dòng (khoảng trắng trước dấu : có thể qua nhiều dòng)
+MEAL_HEADING = re.compile(
+    r'(?i)(Sáng|Phụ sáng|Trưa|Phụ chiều|Tối|Phụ tối|Bữa sáng|Bữa phụ 1|Bữa trưa|Bữa phụ 2|Bữa tối|Bữa phụ 3|Bữa phụ tối)\s*[:\.]'
+)
+WHITESPACE = re.compile(r"\s*")
+WORKOUT_HEADING = re.compile(r'(?i)^(tập|strength|bài tập|lưu ý)')
+EXERCISE_TITLE_CHARS = re.compile(r'(?i)[A-ZĐa-zÀ-ỹ0-9\s\-\(\)]*')
+
+
+# ========== MARKDOWN ==========
+def markdown_like_to_html(text):
+    if not text:
+        return ""
+    s = text.strip().replace("\r\n", "\n").replace("\r", "\n")
+    # 1. Xử lý in đậm **...**
+    s = BOLD_PATTERN.sub(r"<strong>\1</strong>", s)
+    lines = s.split("\n")
+    out = []
+    in_list = False
+
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            if in_list:
+                out.append("</ul>")
+                in_list = False
+            continue
+
+        # 2. Chỉ chuyển đổi thành <li> nếu khớp với mẫu danh sách
+        if LIST_PATTERN.match(line):
+            if not in_list:
+                out.append("<ul>")
+            in_list = True
+            li = LIST_PATTERN.sub("", line, 1)  # Chỉ thay thế lần xuất hiện đầu tiên
+            out.append(f"<li>{li}</li>")
+        else:
+            if in_list:
+                out.append("</ul>")
+                in_list = False
+            out.append(f"<p>{line}</p>")
+
+    if in_list:
+        out.append("</ul>")
+
+    # Loại bỏ dấu ** thừa nếu có
+    html = "\n".join(out).replace("**", "")
+    return html.strip()
+
+
+def markdown_like_to_text(text):
+    """
+    Văn bản thuần tương đương với việc bỏ thẻ khỏi markdown_like_to_html(text)
+    (dòng <ul>/</ul> thành dòng trống), dùng để tách to-do mà không cần dựng rồi bóc HTML.
+    """
+    if not text:
+        return ""
+    s = text.strip().replace("\r\n", "\n").replace("\r", "\n")
+    # \x00 đứng thay cho <strong>/</strong>: chặn LIST_PATTERN giống như thẻ thật
+    s = BOLD_PATTERN.sub("\x00\\1\x00", s)
+    out = []
+    in_list = False
+    for raw in s.split("\n"):
+        line = raw.strip()
+        if not line:
+            if in_list:
+                out.append("")
+                in_list = False
+            continue
+        if LIST_PATTERN.match(line):
+            if not in_list:
+                out.append("")
+            in_list = True
+            out.append(LIST_PATTERN.sub("", line, 1))
+        else:
+            if in_list:
+                out.append("")
+                in_list = False
+            out.append(line)
+    if in_list:
+        out.append("")
+    return strip_tags("\n".join(out).replace("**", "").replace("\x00", ""))
+
+
+def strip_tags(text):
+    """
+    Bỏ thẻ: cùng kết quả với re.sub(r"<[^>]*>", "", text) nhưng tuyến tính. Regex thử lại
+    từ mỗi '<' không đóng và quét đến cuối chuỗi (bậc hai); ở đây hết '>' là dừng luôn.
+    """
+    parts = []
+    pos = 0
+    while True:
+        start = text.find("<", pos)
+        if start < 0:
+            break
+        end = text.find(">", start)
+        if end < 0:
+            break
+        parts.append(text[pos:start])
+        pos = end + 1
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+# ========== AST ==========
+@dataclass
+class DayEntry:
+    day: int
+    until: int = None                       # khối lặp "Ngày day đến Ngày until:"
+    lines: list = field(default_factory=list)
+
+    @property
+    def content(self):
+        return "\n".join(self.lines).strip()
+
+
+@dataclass
+class PlanSection:
+    general: list = field(default_factory=list)
+    entries: list = field(default_factory=list)
+
+    @property
+    def general_text(self):
+        return "\n".join(self.general).strip()
+
+
+@dataclass
+class PlanDocument:
+    nutrition: PlanSection = field(default_factory=PlanSection)
+    workout: PlanSection = field(default_factory=PlanSection)
+    notes: PlanSection = field(default_factory=PlanSection)
+
+
+# ========== PARSER ==========
+class _SectionBuilder:
+    """Trạng thái của phần đang đọc: nội dung chung -> (dòng bắt đầu) -> các mục ngày."""
+
+    def __init__(self, key):
+        self.key = key
+        self.section = PlanSection()
+        self.daily = False
+        self.current = None
+
+    def _close(self):
+        if self.current is not None:
+            self.section.entries.append(self.current)
+            self.current = None
+
+    def _tokenize(self, line):
+        pos = 0
+        for m in DAY_TOKEN.finditer(line):
+            if self.current is not None:
+                self.current.lines.append(line[pos:m.start()])
+            self._close()
+            if m.group(2):
+                self.current = DayEntry(int(m.group(1)))
+            elif m.group(3):
+                self.current = DayEntry(int(m.group(1)), until=int(m.group(3)))
+            pos = m.end()
+        if self.current is not None:
+            self.current.lines.append(line[pos:])
+
+    def feed(self, line, last=False):
+        if not self.daily:
+            start = DAILY_START[self.key].search(line) if self.key in DAILY_START else None
+            if start is None:
+                self.section.general.append(line)
+                return
+            self.section.general.append(line[:start.start()])
+            self.daily = True
+            # "Ngày 1:" là dòng bắt đầu thì chính nó là mục đầu tiên
+            line = line[start.start():] if DAY_TOKEN.match(line, start.start()) else line[start.end():]
+        # "---" giữa chừng kết thúc mục đang mở (dòng cuối cùng của văn bản thì không)
+        if line == "---" and not last:
+            self._close()
+            return
+        self._tokenize(line)
+
+    def finish(self):
+        self._close()
+        return self.section
+
+
+def parse_plan(raw_text):
+    """Dựng PlanDocument từ plan_text trong một lượt duyệt các dòng."""
+    doc = PlanDocument()
+    if not raw_text:
+        return doc
+    lines = raw_text.replace("\r\n", "\n").replace("\r", "\n").strip().split("\n")
+
+    builder = None
+    # "---" + các dòng trống: chỉ là ranh giới phần nếu dòng kế tiếp là tiêu đề I/II/III
+    pending = []
+
+    def emit(line, last=False):
+        if builder is not None:
+            builder.feed(line, last)
+
+    for index, line in enumerate(lines):
+        if line == "---" and index > 0:
+            for held in pending:
+                emit(held)
+            pending = [line]
+            continue
+        if pending and line == "":
+            pending.append(line)
+            continue
+        header = SECTION_HEADER.match(line) if pending else None
+        if header:
+            pending = []
+            if builder is not None:
+                setattr(doc, builder.key, builder.finish())
+            roman = header.group(1).split(".", 1)[0].upper()
+            builder = _SectionBuilder(SECTION_KEYS[roman])
+            rest = line[header.end():]
+            if rest:
+                builder.feed(rest)
+            continue
+        for held in pending:
+            emit(held)
+        pending = []
+        emit(line)
+
+    for i, held in enumerate(pending):
+        emit(held, last=i == len(pending) - 1)
+    if builder is not None:
+        setattr(doc, builder.key, builder.finish())
+    return doc
+
+
+# ========== RENDER ==========
+REPEAT_NOTES = {
+    "nutrition": "*LƯU Ý: Đây là lịch dinh dưỡng lặp lại theo nguyên tắc/thực đơn của Ngày {base} như đã đề cập trong mục **Ngày {start} đến Ngày {end}**:\n",
+    "workout": "*LƯU Ý: Đây là lịch tập luyện lặp lại theo Ngày {base} như đã đề cập trong mục **Ngày {start} đến Ngày {end}**:\n",
+}
+
+
+def _resolve_days(section, kind, days, max_days=MAX_PLAN_DAYS):
+    """
+    Điền days[day][kind] = (html, text) từ các mục của một phần: các ngày đơn trước,
+    sau đó các khối lặp (lấy nội dung của ngày cơ sở, tuần trước đó). Chỉ dựng ngày <= max_days.
+    """
+    # Nội dung gốc (chưa kèm ghi chú lặp) của từng ngày: ngày lặp trỏ về nội dung của ngày cơ sở
+    base_content = {}
+    for entry in section.entries:
+        if entry.until is None and entry.day <= max_days:
+            content = entry.content
+            rendered = (markdown_like_to_html(content), markdown_like_to_text(content))
+            days.setdefault(entry.day, {})[kind] = rendered
+            base_content[entry.day] = rendered
+    for entry in section.entries:
+        if entry.until is None or entry.day > max_days:
+            continue
+        start, end = entry.day, entry.until
+        base = start - 7 if start > 7 else 1
+        note = REPEAT_NOTES[kind].format(base=base, start=start, end=end)
+        note_html, note_text = markdown_like_to_html(note), markdown_like_to_text(note)
+        fallback = None
+        for day in range(start, min(end, max_days) + 1):
+            slot = days.setdefault(day, {})
+            base_html, base_text = base_content.get(base, ("", ""))
+            if base_html:
+                slot[kind] = (note_html + base_html, note_text + base_text)
+                base_content[day] = (base_html, base_text)
+            elif entry.content:
+                if fallback is None:
+                    fallback = (markdown_like_to_html(note + entry.content), markdown_like_to_text(note + entry.content))
+                slot[kind] = fallback
+
+
+def meal_todos(text):
+    """
+    To-do bữa ăn và phần văn bản còn lại sau bữa cuối, trong một lượt duyệt văn bản.
+    Cùng kết quả với regex nhiều dòng (DOTALL) của parse_day_details_to_todos nhưng tuyến tính:
+    regex đó thử lại từ đầu mỗi dòng chỉ có khoảng trắng và quét hết phần sau (bậc hai).
+    Nội dung một bữa là dòng có chữ đầu tiên sau dấu : (tới hết dòng đó).
+    """
+    todos = []
+    last_end = 0
+    pos = 0                     # đầu dòng đang xét
+    while pos <= len(text):
+        name_at = WHITESPACE.match(text, pos).end()
+        match = MEAL_HEADING.match(text, name_at)
+        if match is None:
+            # Mọi đầu dòng nằm trong khoảng trắng [pos, name_at) đều dẫn tới cùng vị trí name_at
+            newline = text.find("\n", name_at)
+            if newline < 0:
+                break
+            pos = newline + 1
+            continue
+        start = WHITESPACE.match(text, match.end()).end()
+        end = text.find("\n", start)
+        if end < 0:
+            end = len(text)
+        todos.append(f"{match.group(1).strip()}: {text[start:end].strip()}")
+        last_end = end
+        pos = end + 1
+    return todos, text[last_end:].strip()
+
+
+def day_todos(nutrition_text, workout_text):
+    """To-do List và phần thông tin gợi ý của một ngày, từ văn bản thuần (xem markdown_like_to_text)."""
+    nutrition_todos, remaining = meal_todos(strip_tags(nutrition_text).strip())
+    nutri_info = (
+        "<h6>Thông tin dinh dưỡng khác:</h6>"
+        f"<div class='alert alert-secondary'>{remaining}</div>"
+    ) if remaining else ""
+
+    workout_todos = []
+    workout_info_lines = []
+    for raw in strip_tags(workout_text).strip().splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if WORKOUT_HEADING.match(line):
+            workout_info_lines.append(line)
+            continue
+        # "Tên: mô tả" -> to-do (tên gồm chữ/số/khoảng trắng/-/(), dừng ở dấu : hoặc . đầu tiên)
+        split_at = EXERCISE_TITLE_CHARS.match(line).end()
+        if 0 < split_at < len(line) - 1 and line[split_at] in ":." and line[:split_at].strip():
+            workout_todos.append(f"{line[:split_at].strip()}: {line[split_at + 1:].strip()}")
+        else:
+            workout_info_lines.append(line)
+    workout_info = (
+        "<h6>Khác:</h6>"
+        "<div class='alert alert-secondary'>" + " ".join(workout_info_lines) + "</div>"
+    ) if workout_info_lines else ""
+
+    return nutrition_todos + workout_todos, nutri_info, workout_info
+
+
+def build_plan(raw_text, max_days=MAX_PLAN_DAYS):
+    """
+    Phân tích + render: cùng cấu trúc với build_parsed_plan (HTML từng phần, từng ngày, to-do).
+    Chỉ dựng các ngày 1..max_days (max_days không vượt MAX_PLAN_DAYS).
+    """
+    doc = parse_plan(raw_text)
+    days = {}
+    max_days = min(max_days, MAX_PLAN_DAYS)
+    _resolve_days(doc.nutrition, "nutrition", days, max_days)
+    _resolve_days(doc.workout, "workout", days, max_days)
+    parsed_days = []
+    # Các ngày của khối lặp có cùng nội dung: tách to-do một lần cho mỗi cặp (dinh dưỡng, tập luyện)
+    todos_cache = {}
+    for day in sorted(days):
+        nutrition_html, nutrition_text = days[day].get("nutrition", ("", ""))
+        workout_html, workout_text = days[day].get("workout", ("", ""))
+        pair = (nutrition_text, workout_text)
+        if pair not in todos_cache:
+            todos_cache[pair] = day_todos(nutrition_text, workout_text)
+        todos, nutri_info, workout_info = todos_cache[pair]
+        parsed_days.append({
+            'day': day,
+            'nutrition_html': nutrition_html,
+            'workout_html': workout_html,
+            'todos': list(todos),
+            'nutri_info': nutri_info,
+            'workout_info': workout_info,
+        })
+    return {
+        'nutrition_html': markdown_like_to_html(doc.nutrition.general_text),
+        'workout_html': markdown_like_to_html(doc.workout.general_text),
+        'notes_html': markdown_like_to_html(doc.notes.general_text),
+        'days': parsed_days,
+    }
@@ -0,0 +1,106 @@
+# profiler.py
+"""
+Profiler lấy mẫu (statistical) cho từng request, không cần thư viện ngoài.
+
+Một luồng nền đọc stack của các luồng đang được profile (sys._current_frames) mỗi
+interval giây và đếm theo dạng "collapsed stack" (hàm gốc;...;hàm lá số_mẫu) - định dạng
+đầu vào của flamegraph.pl và speedscope. Chỉ tốn chi phí khi có request đang được profile.
+
+ProfileStore giữ N profile chậm nhất (bỏ cái nhanh nhất khi đầy) để trang admin liệt kê.
+"""
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame):
+    """Stack của một frame dạng "gốc;...;lá"."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self._active = {}           # thread id -> Counter(collapsed stack -> số mẫu)
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _ensure_thread(self):
+        # Gọi khi đang giữ _cond; tạo lại luồng sau fork (luồng không sống qua fork)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+
+    def start(self, thread_id):
+        with self._cond:
+            self._active[thread_id] = Counter()
+            self._ensure_thread()
+            self._cond.notify()
+
+    def stop(self, thread_id):
+        """Dừng profile luồng thread_id, trả về Counter các stack đã lấy mẫu."""
+        with self._cond:
+            return self._active.pop(thread_id, Counter())
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._cond:
+                while not self._active:
+                    self._cond.wait()
+                targets = list(self._active)
+            frames = sys._current_frames()
+            samples = [(tid, collapse_stack(frames[tid])) for tid in targets if tid in frames and tid != own_id]
+            with self._cond:
+                for tid, stack in samples:
+                    counter = self._active.get(tid)
+                    if counter is not None:
+                        counter[stack] += 1
+            time.sleep(self.interval)
+
+
+class ProfileStore:
+    def __init__(self, keep=50):
+        self.keep = keep
+        self._heap = []             # (thời gian xử lý, id, profile): phần tử đầu = profile nhanh nhất
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        """profile: dict có "duration" và "stacks" (Counter); trả về id đã gán."""
+        with self._lock:
+            profile["id"] = next(self._ids)
+            item = (profile["duration"], profile["id"], profile)
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, item)
+            elif item[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, item)
+            return profile["id"]
+
+    def slowest(self):
+        with self._lock:
+            return [p for _, _, p in sorted(self._heap, key=lambda item: item[:2], reverse=True)]
+
+    def get(self, profile_id):
+        with self._lock:
+            for _, pid, profile in self._heap:
+                if pid == profile_id:
+                    return profile
+        return None
+
+
+def folded_text(stacks):
+    """Counter stack -> văn bản collapsed ("a;b;c 12" mỗi dòng) cho flamegraph.pl / speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())